@@ -0,0 +1,221 @@
+import importlib
+import joblib
+import numpy as np
+
+
+# estimators by import path, a backend module is only imported the first time one of its estimators is used
+ESTIMATORS = {
+    'linear_regression': 'sklearn.linear_model.LinearRegression',
+    'random_forest': 'sklearn.ensemble.RandomForestRegressor',
+    'decision_tree': 'sklearn.tree.DecisionTreeRegressor',
+    'gradient_boosting': 'sklearn.ensemble.GradientBoostingRegressor',
+    'knn_regression': 'sklearn.neighbors.KNeighborsRegressor',
+    'neural_network': 'sklearn.neural_network.MLPRegressor',
+    'hist_gbm': 'sklearn.ensemble.HistGradientBoostingRegressor',
+}
+
+CLASSIFIERS = {
+    'linear_regression': 'sklearn.linear_model.LinearRegression',
+    'decision_tree': 'sklearn.tree.DecisionTreeClassifier',
+    'random_forest': 'sklearn.ensemble.RandomForestClassifier',
+    'svm': 'sklearn.svm.SVC',
+    'logistic_regression': 'sklearn.linear_model.LogisticRegression',
+    'knn': 'sklearn.neighbors.KNeighborsClassifier',
+    'naive_bayes': 'sklearn.naive_bayes.GaussianNB',
+    'neural_network': 'sklearn.neural_network.MLPClassifier',
+    'gradient_boosting': 'sklearn.ensemble.GradientBoostingClassifier',
+}
+
+_loaded = {}
+
+
+def load(path):
+    """
+    Import `package.module.Name` on first use and return the attribute.
+    """
+    found = _loaded.get(path)
+    if found is None:
+        module, _, name = path.rpartition('.')
+        found = getattr(importlib.import_module(module), name)
+        _loaded[path] = found
+    return found
+
+
+def estimator(algorithm, registry=ESTIMATORS):
+    path = registry.get(algorithm)
+    if path is None:
+        raise ValueError(f"Unsupported algorithm: {algorithm}")
+    return load(path)
+
+
+def tensorflow():
+    # several seconds and hundreds of MB, only paid by the tensorflow engine
+    return importlib.import_module('tensorflow')
+
+
+class Engine:
+    """
+    A training backend. `algorithms` are the candidate models it contributes to a training request,
+    `defaults` their default hyper parameters. fit, predict and serialize are the hooks the trainer
+    and the registry upload go through, the serialized model only has to provide predict(X).
+    """
+    algorithms = []
+    defaults = {}
+
+    def __init__(self, parameters=None):
+        self.parameters = parameters if parameters is not None else {}
+
+    def train(self, trainer, input_data, testing_data = None):
+        return trainer.train_sk(input_data, testing_data)
+
+    def create(self, algorithm, params):
+        return estimator(algorithm)(**{ **self.defaults.get(algorithm, {}), **params })
+
+    def fit(self, model, X, y, validation=None):
+        model.fit(X, y)
+        return model
+
+    def predict(self, model, X):
+        return model.predict(X)
+
+    def resume(self, model, X, y, fraction):
+        """
+        Continue training a fitted model on new rows only, `fraction` is their share of the whole
+        window. Ensembles add that share of estimators with warm_start, models with partial_fit
+        take one more pass. Returns how the model was trained, None when it can only be refit.
+        """
+        params = model.get_params()
+        if params.get('warm_start') is not None:
+            for key in ['n_estimators', 'max_iter']:
+                if key in params and not hasattr(model, 'partial_fit'):
+                    model.set_params(warm_start=True, **{ key: params[key] + max(1, int(np.ceil(params[key] * fraction))) })
+                    model.fit(X, y)
+                    return 'warm_start'
+        if hasattr(model, 'partial_fit'):
+            model.partial_fit(X, y)
+            return 'partial_fit'
+        return None
+
+    def serialize(self, model, path):
+        joblib.dump(model, path)
+
+
+class SklearnEngine(Engine):
+    algorithms = ['linear_regression', 'random_forest', 'decision_tree', 'gradient_boosting']
+    defaults = {
+        'gradient_boosting': { 'n_estimators': 300, 'learning_rate': 0.1, 'max_depth': 8, 'random_state': 142 },
+    }
+
+
+class HistGBMEngine(Engine):
+    # histogram binned gradient boosting, much faster than gradient_boosting on larger datasets
+    algorithms = ['hist_gbm']
+    defaults = {
+        'hist_gbm': { 'max_iter': 300, 'learning_rate': 0.1, 'random_state': 142 },
+    }
+
+
+class TensorflowEngine(Engine):
+    """
+    Keras models fed through a tf.data pipeline of float32 arrays. `parameters['tensorflow']` sets
+    batch_size, epochs (the maximum) and patience, the epochs without improvement on the
+    validation data (validation_fraction of the training split) before early stopping restores
+    the best weights. With multi_head the
+    variants train as the heads of one model in a single pass.
+    """
+    algorithms = ['tf_relu', 'tf_sigmoid', 'tf_tanh']
+    activations = { 'tf_relu': 'relu', 'tf_sigmoid': 'sigmoid', 'tf_tanh': 'tanh' }
+
+    def __init__(self, parameters=None):
+        super().__init__(parameters)
+        settings = self.parameters.get('tensorflow', {})
+        self.batch_size = settings.get('batch_size', 32)
+        self.epochs = settings.get('epochs', 50)
+        self.patience = settings.get('patience', 5)
+        self.seed = settings.get('seed', self.parameters.get('split', {}).get('random_state'))
+        self.multi_head = settings.get('multi_head', False)
+        # share of the training split held out for early stopping, the test split only scores
+        self.validation_fraction = settings.get('validation_fraction', 0.2)
+
+    def train(self, trainer, input_data, testing_data = None):
+        return trainer.train_tf(input_data, testing_data)
+
+    def create(self, algorithm, params):
+        tf = tensorflow()
+        model = tf.keras.Sequential([
+            tf.keras.Input(shape=(params['features'],)),
+            tf.keras.layers.Dense(64, activation=self.activations[algorithm]),
+            tf.keras.layers.Dense(1)
+        ])
+        model.compile(optimizer='adam', loss='mse')
+        return model
+
+    def create_heads(self, features):
+        """
+        One model with a head per variant on a shared input, every head has the layers of the
+        variant's standalone model. The loss is the sum of the heads' mse.
+        """
+        tf = tensorflow()
+        inputs = tf.keras.Input(shape=(features,))
+        outputs = {}
+        for name in self.algorithms:
+            hidden = tf.keras.layers.Dense(64, activation=self.activations[name], name=f'{name}_hidden')(inputs)
+            outputs[name] = tf.keras.layers.Dense(1, name=name)(hidden)
+        model = tf.keras.Model(inputs, outputs)
+        model.compile(optimizer='adam', loss='mse')
+        return model
+
+    def export_head(self, model, name):
+        # a standalone copy of one head, it predicts like the other models in the registry
+        standalone = self.create(name, { 'features': model.inputs[0].shape[-1] })
+        standalone.set_weights(model.get_layer(f'{name}_hidden').get_weights() + model.get_layer(name).get_weights())
+        return standalone
+
+    def predict_heads(self, model, X):
+        predictions = model.predict(self.dataset(X), verbose=0)
+        return { name: predictions[name].reshape(-1).astype(np.float64) for name in self.algorithms }
+
+    def dataset(self, X, y=None, shuffle=False, outputs=None):
+        tf = tensorflow()
+        X = np.asarray(X, dtype=np.float32)
+        if y is not None:
+            y = np.asarray(y, dtype=np.float32)
+            # a multi output model gets the same target for every head
+            y = y if outputs is None else { name: y for name in outputs }
+        data = tf.data.Dataset.from_tensor_slices(X if y is None else (X, y))
+        if shuffle:
+            data = data.shuffle(len(X), seed=self.seed, reshuffle_each_iteration=True)
+        return data.batch(self.batch_size).prefetch(tf.data.AUTOTUNE)
+
+    def fit(self, model, X, y, validation=None):
+        tf = tensorflow()
+        outputs = model.output_names if len(model.outputs) > 1 else None
+        callbacks = []
+        if validation is not None and len(validation[0]) > 0:
+            callbacks.append(tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=self.patience, restore_best_weights=True))
+            validation = self.dataset(*validation, outputs=outputs)
+        else:
+            validation = None
+        model.fit(self.dataset(X, y, shuffle=True, outputs=outputs), validation_data=validation, epochs=self.epochs,
+                  callbacks=callbacks, shuffle=False, verbose=0)
+        return model
+
+    def predict(self, model, X):
+        return model.predict(self.dataset(X), verbose=0).reshape(-1).astype(np.float64)
+
+    def resume(self, model, X, y, fraction):
+        # the loaded model keeps its weights and optimizer state, training resumes for `epochs` more
+        self.fit(model, X, y)
+        return 'epochs'
+
+
+ENGINES = {
+    'default': SklearnEngine,
+    'hist_gbm': HistGBMEngine,
+    'tensorflow': TensorflowEngine,
+}
+
+
+def engine(name, parameters=None):
+    # unknown engine names train the default sklearn candidates, as they always have
+    return ENGINES.get(name, ENGINES['default'])(parameters)
@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+from lrnstak.predictions_module import Model
+from lrnstak.processor_rules import ExpandRules
+
+
+class PredictionSession:
+    """
+    Predictions for a growing window of rows of one model version. The prediction and the echo
+    columns of every row seen are kept in a bounded LRU keyed by the row's content, so appending
+    rows only preprocesses and predicts the rows that were not seen before. Expand rules whose
+    columns depend on the other rows (pivot, or columns without a width) make every append
+    recompute the session's window instead, rows posted again are not added to it twice.
+    """
+
+    def __init__(self, model, parameters, rules, max_rows=10000):
+        self.model = model
+        self.parameters = parameters
+        self.rules = rules
+        self.max_rows = max_rows
+        self.cache = OrderedDict()
+        self.window = OrderedDict()
+        self.lock = threading.Lock()
+        self.row_local = all(self._row_local(operation) for operation in rules.operations)
+        self.stats = { 'rows': 0, 'computed': 0 }
+
+    def _row_local(self, operation):
+        if not isinstance(operation.processor, ExpandRules):
+            return True
+        definition = operation.processor.definitions[operation.feature]
+        return isinstance(definition, dict) and definition.get('type') == 'columns' and definition.get('width') is not None
+
+    def append(self, rows, columns=[]):
+        """
+        Predict the appended rows, only the rows not seen before are preprocessed and predicted.
+        Returns the columnar response of Model.evaluate for the appended rows.
+        """
+        with self.lock:
+            keys = [json.dumps(row, sort_keys=True, default=str) for row in rows]
+
+            if self.row_local:
+                found = {}
+                missing = {}
+                for key, row in zip(keys, rows):
+                    entry = self.cache.get(key)
+                    # a row seen without one of the requested echo columns is computed again
+                    if entry is not None and all(col in entry[1] for col in columns):
+                        self.cache.move_to_end(key)
+                        found[key] = entry
+                    else:
+                        missing.setdefault(key, row)
+                computed = self._compute(list(missing.values()), columns)
+                for key, entry in zip(missing, computed):
+                    found[key] = entry
+                    self._remember(key, entry)
+                computed = len(missing)
+            else:
+                # the whole window is preprocessed again, fitted to the last max_rows distinct rows
+                for key, row in zip(keys, rows):
+                    if key not in self.window:
+                        self.window[key] = row
+                while len(self.window) > self.max_rows:
+                    self.window.popitem(last=False)
+                found = dict(zip(self.window, self._compute(list(self.window.values()), columns)))
+                computed = len(self.window)
+
+            self.stats['rows'] += len(rows)
+            self.stats['computed'] += computed
+
+            entries = [found[key] for key in keys]
+            return {
+                'prediction': np.array([prediction for prediction, _ in entries], dtype=np.float64),
+                'columns': { col: [echo[col] for _, echo in entries] for col in columns },
+                'computed': computed,
+            }
+
+    def _compute(self, rows, columns):
+        # only the prediction and the echo columns are kept, never the raw or preprocessed row
+        if len(rows) == 0:
+            return []
+        df, feature_cols, target_label = Model()._data_features_target(rows, self.parameters, self.rules, columns=columns)
+        missing_columns = [col for col in columns if col not in df.columns]
+        if len(missing_columns) > 0:
+            raise ValueError(f"Unknown columns: {missing_columns}")
+        predictions = np.asarray(self.model.predict(df[feature_cols]), dtype=np.float64).reshape(-1)
+        echoes = df[list(columns)].to_dict(orient='records') if len(columns) > 0 else [{}] * len(df)
+        return list(zip(predictions.tolist(), echoes))
+
+    def _remember(self, key, entry):
+        self.cache[key] = entry
+        while len(self.cache) > self.max_rows:
+            self.cache.popitem(last=False)
+
+
+class SessionStore:
+    """
+    Open prediction sessions by id. A session expires `ttl` seconds after its last use, at most
+    `max_sessions` are kept (the least recently used is closed first).
+    """
+
+    def __init__(self, ttl=600, max_sessions=1000, max_rows=10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_rows = max_rows
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def open(self, model, parameters, rules):
+        session_id = uuid.uuid4().hex
+        with self.lock:
+            self._purge()
+            self.sessions[session_id] = (PredictionSession(model, parameters, rules, self.max_rows), time.time() + self.ttl)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return session_id
+
+    def get(self, session_id):
+        with self.lock:
+            self._purge()
+            found = self.sessions.get(session_id)
+            if found is None:
+                return None
+            # every use extends the session
+            self.sessions[session_id] = (found[0], time.time() + self.ttl)
+            self.sessions.move_to_end(session_id)
+            return found[0]
+
+    def close(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def _purge(self):
+        now = time.time()
+        expired = [session_id for session_id, (_, expires) in self.sessions.items() if expires < now]
+        for session_id in expired:
+            del self.sessions[session_id]
+
+
+PERIODS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+    'month': timedelta(days=31),
+}
+
+
+def forecast(pipelines, input_data, steps, timestamp=None, max_rows=10000):
+    """
+    Recursive multi-step forecast. `pipelines` maps every forecast column to the (model,
+    parameters, rules) predicting it. Each step predicts the last row with every model and appends
+    a copy of it holding the predictions, with `timestamp` = { 'column', 'period' } advanced by one
+    period, so the next step predicts from the predicted values. The models' sessions keep the rule
+    outputs of the rows seen, so a step only preprocesses the appended row.
+    """
+    if timestamp is not None and timestamp.get('period', 'day') not in PERIODS:
+        raise ValueError(f"Unsupported period: {timestamp.get('period')}, expected one of {list(PERIODS)}")
+    if timestamp is not None and len(input_data) > 0 and timestamp['column'] not in input_data[-1]:
+        raise ValueError(f"Unknown timestamp column: {timestamp['column']}")
+
+    sessions = {column: PredictionSession(*pipeline, max_rows=max_rows) for column, pipeline in pipelines.items()}
+    window = list(input_data)
+    trajectory = {column: [] for column in pipelines}
+    rows = []
+
+    for step in range(steps):
+        row = dict(window[-1])
+        for column, session in sessions.items():
+            if step == 0:
+                # rules that look across rows need the whole window, the others just the last row
+                pending = [window[-1]] if session.row_local else window
+            else:
+                pending = [window[-1]]
+            prediction = float(session.append(pending)['prediction'][-1])
+            trajectory[column].append(prediction)
+            row[column] = prediction
+
+        if timestamp is not None:
+            row[timestamp['column']] = _advance(row[timestamp['column']], PERIODS[timestamp.get('period', 'day')])
+
+        window.append(row)
+        rows.append(row)
+
+    return { 'forecast': {column: np.array(values, dtype=np.float64) for column, values in trajectory.items()}, 'rows': rows }
+
+
+def _advance(value, period):
+    # the advanced timestamp keeps the input's format: epoch seconds, a UTC 'Z' string or ISO with its offset
+    if isinstance(value, (int, float)):
+        return value + type(value)(period.total_seconds())
+    advanced = pd.Timestamp(value) + period
+    if value.endswith('Z'):
+        return advanced.tz_convert('UTC').isoformat().replace('+00:00', 'Z')
+    if len(value) == 10:
+        return advanced.date().isoformat()
+    return advanced.isoformat(sep=' ' if ' ' in value else 'T')
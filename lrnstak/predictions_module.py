@@ -1,20 +1,121 @@
+import json
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error
-from sklearn.tree import DecisionTreeRegressor
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.neighbors import KNeighborsRegressor
-from sklearn.neural_network import MLPRegressor
-
-from lrnstak.processor_rules import Rules
+from concurrent.futures import ThreadPoolExecutor
+
+from lrnstak import engines
+from lrnstak.processor_rules import Rules, ClassifyRules
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(response):
+    """
+    JSON bytes of a response holding numpy arrays. orjson serializes numeric buffers directly,
+    the json fallback converts them to lists. Both write NaN and infinity as null and timestamps
+    in ISO format, so the output is always valid JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(response, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    try:
+        return json.dumps(response, default=_json_default, allow_nan=False).encode('utf-8')
+    except ValueError:
+        # only responses holding NaN or infinity pay for replacing them with null
+        return json.dumps(_finite(response), default=_json_default, allow_nan=False).encode('utf-8')
+
+
+def _finite(value):
+    # what orjson does natively: non finite floats become null
+    if isinstance(value, dict):
+        return {key: _finite(val) for key, val in value.items()}
+    if isinstance(value, np.ndarray) and value.ndim == 1 and value.dtype.kind == 'f':
+        values = value.tolist()
+        for i in np.flatnonzero(~np.isfinite(value)).tolist():
+            values[i] = None
+        return values
+    if isinstance(value, np.ndarray):
+        return _finite(value.tolist())
+    if isinstance(value, (list, tuple)):
+        return [_finite(val) for val in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
 
 
 class Model:
 
-    def evaluate(self, model, input_data, parameters):
-        df, feature_cols, target_label = self._data_features_target(input_data, parameters)
+    def evaluate(self, model, input_data, parameters, format='rows', columns=None, rules=None):
+        """
+        Predict every row of the input. The rows format returns one dict per row, the prediction
+        merged into the preprocessed row. The columns format returns the predictions as one array
+        plus only the requested echo columns, e.g. { 'prediction': [...], 'columns': { 'last_timestamp': [...] } }.
+        `rules` are the model's compiled rules, built from the parameters when not given.
+        """
+        # the rows format returns every rule output, the columns format only runs what it echoes
+        df, feature_cols, target_label = self._data_features_target(input_data, parameters, rules, columns=columns or [],
+                                                                    prune=format == 'columns')
+        return self._evaluate_frame(model, df, feature_cols, format, columns)
+
+    def evaluate_batch(self, pipelines, input_data, format='columns', columns=None, max_workers=None):
+        """
+        Evaluate several models on one dataset, `pipelines` are (model, parameters, rules) tuples.
+        The raw frame is built once and models with identical rules share one preprocessing pass,
+        whatever their target unless a classify rule reads it. Pipelines and predictions run on a
+        thread pool, one result per pipeline.
+        """
+        actual_df = pd.DataFrame(input_data)
+        pipelines = list(pipelines)
+
+        groups = {}
+        for i, (model, parameters, rules) in enumerate(pipelines):
+            if rules is None:
+                rules = Rules(parameters.get('rules', {}))
+                pipelines[i] = (model, parameters, rules)
+            key = (json.dumps(parameters.get('rules', {}), sort_keys=True), None)
+            if any(isinstance(operation.processor, ClassifyRules) for operation in rules.operations):
+                key = (key[0], self._target_label(parameters))
+            groups.setdefault(key, []).append(i)
+
+        def _preprocess(indices):
+            model, parameters, rules = pipelines[indices[0]]
+            # the rules every feature, target and echo column of the group depends on
+            features = []
+            for i in indices:
+                needed = self._feature_cols(pipelines[i][1]) + [self._target_label(pipelines[i][1])]
+                features.extend(col for col in needed if col not in features)
+            features.extend(col for col in columns or [] if col not in features)
+            preprocessed_df, _ = rules.apply(actual_df, self._target_label(parameters), features=features if format == 'columns' else None)
+            return preprocessed_df
+
+        def _evaluate(i):
+            model, parameters, rules = pipelines[i]
+            return self._evaluate_frame(model, frames[i], self._feature_cols(parameters), format, columns)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            frames = {}
+            for indices, preprocessed_df in zip(groups.values(), executor.map(_preprocess, groups.values())):
+                for i in indices:
+                    frames[i] = preprocessed_df
+            return list(executor.map(_evaluate, range(len(pipelines))))
+
+    def _evaluate_frame(self, model, df, feature_cols, format, columns):
+        if format == 'columns':
+            return self._evaluate_columns(model, df, feature_cols, columns or [])
 
         actual_values = df.to_dict(orient="index")
         actual_array = [value for key, value in actual_values.items()]
@@ -22,15 +123,38 @@ class Model:
         combined = [{"prediction": predicted, **actual} for actual, predicted in zip(actual_array, predictions)]
         return combined
 
-    def _data_features_target(self, input_data, parameters):
-        target_label = parameters.get('target_label', 'last_close')
-        feature_cols = parameters.get('feature_labels',
-                                      ['last_open', 'last_trades', 'last_volume', 'percentile_close', 'percentile_high',
-                                       'percentile_low', 'price_avg', 'price_min']).copy()
+    def _evaluate_columns(self, model, df, feature_cols, columns):
+        missing = [col for col in columns if col not in df.columns]
+        if len(missing) > 0:
+            raise ValueError(f"Unknown columns: {missing}")
+
+        predictions = np.ascontiguousarray(model.predict(df[feature_cols]), dtype=np.float64).reshape(-1)
+        echo = {}
+        for col in columns:
+            values = df[col].to_numpy()
+            # numeric columns stay numpy buffers, anything else is echoed as a list of values
+            echo[col] = np.ascontiguousarray(values) if values.dtype.kind in 'biuf' else values.tolist()
+        return { 'prediction': predictions, 'columns': echo }
+
+    def _target_label(self, parameters):
+        return parameters.get('target_label', 'last_close')
+
+    def _feature_cols(self, parameters):
+        return parameters.get('feature_labels',
+                              ['last_open', 'last_trades', 'last_volume', 'percentile_close', 'percentile_high',
+                               'percentile_low', 'price_avg', 'price_min']).copy()
+
+    def _data_features_target(self, input_data, parameters, rules=None, columns=(), prune=True):
+        target_label = self._target_label(parameters)
+        feature_cols = self._feature_cols(parameters)
 
         actual_df = pd.DataFrame(input_data)
 
-        preprocessed_df, added_features = Rules(parameters.get('rules', {})).apply(actual_df, target_label)
+        # with prune, only the rules the model's features and the echoed `columns` depend on are run
+        if rules is None:
+            rules = Rules(parameters.get('rules', {}))
+        features = feature_cols + [col for col in columns if col not in feature_cols] if prune else None
+        preprocessed_df, added_features = rules.apply(actual_df, target_label, features=features)
         # feature_cols.extend(added_features)
 
         return preprocessed_df, feature_cols, target_label
@@ -38,6 +162,9 @@ class Model:
     def predict(self, input_data, target_label='last_close',
                 feature_cols=['last_open', 'last_trades', 'last_volume', 'percentile_close', 'percentile_high',
                               'percentile_low', 'price_avg', 'price_min']):
+        from sklearn.metrics import mean_squared_error
+        from sklearn.model_selection import train_test_split
+
         actual_df = pd.DataFrame(input_data)
         train_df = pd.DataFrame(input_data[0:len(input_data) - 1])
 
@@ -49,13 +176,13 @@ class Model:
 
         # Define models and their variations
         models = {
-            'linear_regression': LinearRegression(),
-            'random_forest': RandomForestRegressor(n_estimators=300, random_state=142),
-            'decision_tree': DecisionTreeRegressor(random_state=142),
-            'gradient_boosting': GradientBoostingRegressor(n_estimators=300, learning_rate=0.1, max_depth=8,
-                                                           random_state=142),
-            #             'knn_regression': KNeighborsRegressor(n_neighbors=5),
-            #             'neural_network': MLPRegressor(hidden_layer_sizes=(100, ), max_iter=1000, random_state=142),
+            'linear_regression': engines.estimator('linear_regression')(),
+            'random_forest': engines.estimator('random_forest')(n_estimators=300, random_state=142),
+            'decision_tree': engines.estimator('decision_tree')(random_state=142),
+            'gradient_boosting': engines.estimator('gradient_boosting')(n_estimators=300, learning_rate=0.1, max_depth=8,
+                                                                        random_state=142),
+            #             'knn_regression': engines.estimator('knn_regression')(n_neighbors=5),
+            #             'neural_network': engines.estimator('neural_network')(hidden_layer_sizes=(100, ), max_iter=1000, random_state=142),
         }
 
         # Train, test, and evaluate each model
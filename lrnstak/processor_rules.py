@@ -1,36 +1,28 @@
+import os
+import re
 import sys
+import threading
 import requests
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import AdaBoostClassifier
-from sklearn.ensemble import GradientBoostingClassifier
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.ensemble import VotingClassifier
-from sklearn.linear_model import LinearRegression
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from sklearn.model_selection import train_test_split
-from sklearn.naive_bayes import GaussianNB
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.neighbors import KNeighborsRegressor
-from sklearn.neural_network import MLPClassifier
-from sklearn.neural_network import MLPRegressor
-from sklearn.svm import SVC
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.tree import DecisionTreeRegressor
+from lrnstak import engines
+from lrnstak.ragged_array import RaggedArray
 
 
 class PreProcessor:
     def __init__(self, config):
         self.rules = {} # keep internal dict of rules keyed by the feature column name, values are functions
+        self.definitions = {}
         if config is not None:
             # build self.rules
             for feature, calc_type in config.items():
                 rule_function = self.get_function(calc_type)
                 if rule_function:
                     self.rules[feature] = rule_function
+                    self.definitions[feature] = calc_type
 
     def rules(self):
         return self.rules
@@ -41,75 +33,349 @@ class PreProcessor:
     def get_function(self, calc_type):
         raise Exception("method must be implemented by child class.")
 
-    def apply(self, df):
+    def output_names(self, feature, definition):
+        # names of the columns a rule creates, None when they depend on the data
+        return None
+
+    def output_prefix(self, feature):
+        # common prefix of the created columns when output_names() is None
+        return ''
+
+    def run_rule(self, feature, df, target_label):
+        return self.rules[feature](feature, df[feature])
+
+    def apply(self, df, copy=True):
         # apply all rules and return new data
-        new_features = []
+        results = []
+        produced = {}
         for feature, rule_function in sorted(self.rules.items()):
             #if feature in df.columns:
-            results = rule_function(feature, df[feature])
-            for key, val in sorted(results.items()):
+            # a rule may read a column produced by an earlier rule of the same stage
+            column = produced[feature] if feature in produced else df[feature]
+            result = rule_function(feature, column)
+            results.append(result)
+            produced.update(result.items())
+        return self.materialize(df, results, copy)
+
+    @staticmethod
+    def materialize(df, results, copy=True):
+        """
+        Attach the outputs of every rule to the frame.
+        With copy=True (default) the caller's frame is left untouched and all new columns are
+        joined into a new frame with one concat, copy=False writes them into the caller's frame.
+        """
+        new_features = []
+        columns = {}
+        for result in results:
+            for key, val in sorted(result.items()):
                 new_features.append(key)
+                columns[key] = val
+
+        if not columns:
+            return (df.copy(deep=False) if copy else df), new_features
+
+        if not copy:
+            # legacy behaviour, opt-in: the caller's frame gains the new columns
+            for key, val in columns.items():
                 df[key] = val
+            return df, new_features
+
+        new_df = pd.DataFrame(columns, index=df.index)
+        df = pd.concat([df.drop(columns=new_df.columns, errors='ignore'), new_df], axis=1)
         return df, new_features
 
+class RuleOperation:
+    """
+    One rule applied to one input column, the unit of work of a compiled Rules plan.
+    """
+
+    def __init__(self, processor, feature, order):
+        self.processor = processor
+        self.feature = feature
+        self.order = order
+        self.outputs = processor.output_names(feature, processor.definitions[feature])
+        self.prefix = processor.output_prefix(feature)
+
+    def reads(self, target_label):
+        if isinstance(self.processor, ClassifyRules):
+            return {self.feature, target_label}
+        return {self.feature}
+
+    def produces(self, column):
+        if self.outputs is not None:
+            return column in self.outputs
+        return isinstance(column, str) and column.startswith(self.prefix)
+
+    def conflicts(self, other, target_label):
+        # read-after-write, write-after-read or write-after-write on any column
+        if any(self.produces(column) for column in other.reads(target_label)):
+            return True
+        if any(other.produces(column) for column in self.reads(target_label)):
+            return True
+        if self.outputs is not None:
+            return any(other.produces(column) for column in self.outputs)
+        if other.outputs is not None:
+            return any(self.produces(column) for column in other.outputs)
+        return self.prefix.startswith(other.prefix) or other.prefix.startswith(self.prefix)
+
+    def run(self, df, target_label):
+        return self.processor.run_rule(self.feature, df, target_label)
+
+
 class Rules:
 
-    def __init__(self, instructions):
+    def __init__(self, instructions, max_workers=None):
         self.instructions = instructions if instructions is not None else {}
-        self.extract = ExtractRules(instructions.get('extract', {}))
-        self.flatten = FlattenRules(instructions.get('flatten', {}))
-        self.classify = ClassifyRules(instructions.get('classify', {}))
-        self.expand = ExpandRules(instructions.get('expand', {}))
+        self.max_workers = max_workers if max_workers is not None else min(4, os.cpu_count() or 1)
+        self.extract = ExtractRules(self.instructions.get('extract', {}))
+        self.flatten = FlattenRules(self.instructions.get('flatten', {}))
+        self.classify = ClassifyRules(self.instructions.get('classify', {}))
+        self.expand = ExpandRules(self.instructions.get('expand', {}))
         self.stages = []
-        for stage_cfg in instructions.get('stages', []):
-            self.stages.append(Rules(stage_cfg))
-
-    def apply(self, df, target_label):
+        for stage_cfg in self.instructions.get('stages', []):
+            self.stages.append(Rules(stage_cfg, max_workers=1))
+
+        # compile once: every rule of every stage in program order
+        self.operations = []
+        self._compile(self)
+        self.schedules = {}
+
+    def _compile(self, rules):
+        for processor in [rules.extract, rules.flatten, rules.classify, rules.expand]:
+            for feature in sorted(processor.rules.keys()):
+                self.operations.append(RuleOperation(processor, feature, len(self.operations)))
+        for stage in rules.stages:
+            self._compile(stage)
+
+    def schedule(self, target_label, features=None):
+        """
+        Waves of independent operations. An operation runs one wave after the last operation it
+        conflicts with. With `features`, operations that no requested feature (or the target)
+        depends on are left out.
+        """
+        key = (target_label, tuple(features) if features is not None else None)
+        found = self.schedules.get(key)
+        if found is not None:
+            return found
+
+        operations = self.operations
+        if features is not None:
+            needed = set(features) | {target_label}
+            kept = []
+            for operation in reversed(operations):
+                if any(operation.produces(column) for column in needed):
+                    kept.append(operation)
+                    needed |= operation.reads(target_label)
+            operations = list(reversed(kept))
+
+        levels = []
+        for j, operation in enumerate(operations):
+            level = 0
+            for i in range(j):
+                if levels[i] >= level and operations[i].conflicts(operation, target_label):
+                    level = levels[i] + 1
+            levels.append(level)
+
+        waves = [[] for _ in range(max(levels, default=-1) + 1)]
+        for operation, level in zip(operations, levels):
+            waves[level].append(operation)
+
+        self.schedules[key] = waves
+        return waves
+
+    def apply(self, df, target_label, copy=True, features=None):
+        # copy=True (copy-on-write) leaves the caller's frame untouched, every wave
+        # returns a new frame; copy=False writes the new columns into the caller's frame
+        results = {}
+        waves = self.schedule(target_label, features)
+        if not waves:
+            return (df.copy(deep=False) if copy else df), []
+
+        for wave in waves:
+            if len(wave) > 1 and self.max_workers > 1:
+                # independent rules, numpy releases the GIL for most of the work
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(wave))) as executor:
+                    wave_results = list(executor.map(lambda operation: operation.run(df, target_label), wave))
+            else:
+                wave_results = [operation.run(df, target_label) for operation in wave]
+
+            df, _ = PreProcessor.materialize(df, wave_results, copy)
+            for operation, result in zip(wave, wave_results):
+                results[operation.order] = result
+
+        # report new features in program order, once each
         new_features = []
+        for order in sorted(results):
+            for key in sorted(results[order].keys()):
+                if key not in new_features:
+                    new_features.append(key)
 
-        # extract
-        df, features = self.extract.apply(df)
-        new_features.extend(features)
-
-        # flatten
-        df, features = self.flatten.apply(df)
-        new_features.extend(features)
-
-        # classify
-        df, features = self.classify.apply(df, target_label)
-        new_features.extend(features)
+        return df, new_features
 
-        # expand
-        df, features = self.expand.apply(df)
-        new_features.extend(features)
+class DatetimeParseCache:
+    """
+    Bounded LRU memo of parsed timestamps keyed by (format, raw value).
+    Every distinct raw value is parsed once, misses are parsed together in one pd.to_datetime call.
+    Timestamps that do not share one time zone (mixed offsets, or naive and aware values) are
+    returned as an object column of Timestamps, each keeping its own zone.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def parse(self, input, format=None):
+        codes, uniques = pd.factorize(input)
+
+        parsed = [None] * len(uniques)
+        missing = []
+        with self.lock:
+            for i, value in enumerate(uniques):
+                found = self.entries.get((format, value))
+                if found is None:
+                    missing.append(i)
+                else:
+                    self.entries.move_to_end((format, value))
+                    parsed[i] = found
+
+        if missing:
+            missing_values = self._to_datetime([uniques[i] for i in missing], format)
+            with self.lock:
+                for i, timestamp in zip(missing, missing_values):
+                    parsed[i] = timestamp
+                    self.entries[(format, uniques[i])] = timestamp
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+
+        zones = {str(timestamp.tz) for timestamp in parsed if isinstance(timestamp, pd.Timestamp)}
+        # one trailing NaT so missing input (code -1) takes the last position
+        if len(zones) > 1:
+            parsed_uniques = np.array(parsed + [pd.NaT], dtype=object)
+            return pd.Series(parsed_uniques.take(codes), index=input.index, dtype=object)
+        parsed_uniques = pd.DatetimeIndex(parsed + [pd.NaT])
+        return pd.Series(parsed_uniques.take(codes), index=input.index)
+
+    def _to_datetime(self, values, format):
+        try:
+            return pd.to_datetime(pd.Index(values), format=format)
+        except (ValueError, TypeError):
+            if format is not None:
+                raise
+            # values without a common format are parsed one by one
+            return [pd.to_datetime(value) for value in values]
+
+datetime_cache = DatetimeParseCache()
 
-        for stage in self.stages:
-            df, new_features = stage.apply(df, target_label)
-            new_features.extend(features)
-
-        return df, new_features
 
 class ExtractRules(PreProcessor):
 
+    # period and first value of the datetime elements supported by cyclical encodings
+    cycles = {
+        'minute': (60, 0),
+        'hour': (24, 0),
+        'day_of_week': (7, 0),
+        'day': (31, 1),
+        'month': (12, 1),
+        'day_of_year': (366, 1),
+    }
+
     def __init__(self, config):
         super().__init__(config)
 
     def get_function(self, definition):
-        if definition['type'] == "datetime":
-            def _func(name, input):
-                elements = definition['elements']
-                extracted_data = input.apply(pd.to_datetime)
+        # every extract type is a whole column operation
+        extractors = {
+            'datetime': self.get_datetime,
+            'cyclical': self.get_cyclical,
+            'epoch': self.get_epoch,
+            'numeric': self.get_numeric,
+        }
+        extractor = extractors.get(definition['type'])
+        if extractor is None:
+            raise Exception(f"Unsupported rule type {definition['type']}")
+        return extractor(definition)
+
+    def output_names(self, feature, definition):
+        type = definition['type']
+        if type == 'datetime':
+            return [f'{feature}_{element}' for element in definition['elements']]
+        if type == 'cyclical':
+            elements = definition.get('elements', ['hour', 'day_of_week', 'month'])
+            return [f'{feature}_{element}_{f}' for element in elements for f in ['sin', 'cos']]
+        return [f'{feature}_{type}']
+
+    def get_datetime(self, definition):
+        def _func(name, input):
+            elements = definition['elements']
+            # one vectorized parse of the column, repeated values come from the cache
+            extracted_data = datetime_cache.parse(input, definition.get('format'))
+
+            result = {}
+            for element in elements:
+                values = self._element(extracted_data, element)
+                if pd.api.types.is_integer_dtype(values):
+                    values = values.astype('int64')
+                result[f'{name}_{element}'] = values
+
+            return result
 
-                result = {}
-                for element in elements:
-                    result[f'{name}_{element}'] = extracted_data.apply(lambda dt: getattr(dt, element))
+        return _func
 
-                return result
+    def get_cyclical(self, definition):
+        elements = definition.get('elements', ['hour', 'day_of_week', 'month'])
+        for element in elements:
+            if element not in self.cycles:
+                raise Exception(f"Unsupported cyclical element {element}")
 
-            return _func
-        else:
-            # Handle other extraction types if needed
-            pass
+        def _func(name, input):
+            extracted_data = datetime_cache.parse(input, definition.get('format'))
+
+            result = {}
+            for element in elements:
+                period, first = self.cycles[element]
+                values = self._element(extracted_data, element).to_numpy(dtype=np.float64)
+                angle = 2 * np.pi * (values - first) / period
+                result[f'{name}_{element}_sin'] = pd.Series(np.sin(angle), index=input.index)
+                result[f'{name}_{element}_cos'] = pd.Series(np.cos(angle), index=input.index)
+
+            return result
+
+        return _func
+
+    def get_epoch(self, definition):
+        def _func(name, input):
+            extracted_data = datetime_cache.parse(input, definition.get('format'))
+            if extracted_data.dtype == object:
+                # naive timestamps count as UTC, like the vectorized path
+                epoch = [timestamp.timestamp() if isinstance(timestamp, pd.Timestamp) else np.nan for timestamp in extracted_data]
+                return {f'{name}_epoch': pd.Series(epoch, index=input.index, dtype=np.float64)}
+            epoch = pd.Timestamp(0, tz='UTC') if extracted_data.dt.tz is not None else pd.Timestamp(0)
+
+            # unix epoch seconds, NaN where the timestamp is missing
+            return {f'{name}_epoch': (extracted_data - epoch) / pd.Timedelta(seconds=1)}
+
+        return _func
+
+    def _element(self, extracted_data, element):
+        if extracted_data.dtype == object:
+            # timestamps of mixed zones, every element is read in its own zone
+            values = [getattr(timestamp, element) if isinstance(timestamp, pd.Timestamp) else np.nan for timestamp in extracted_data]
+            return pd.Series(values, index=extracted_data.index)
+        return getattr(extracted_data.dt, element)
+
+    def get_numeric(self, definition):
+        strip = definition.get('strip', None)
+
+        def _func(name, input):
+            values = input
+            if strip:
+                # drop characters such as thousands separators, currency or percent signs
+                values = values.astype(str).str.replace(f'[{re.escape(strip)}]', '', regex=True)
+
+            return {f'{name}_numeric': pd.to_numeric(values, errors='coerce').astype(np.float64)}
+
+        return _func
 
 
 
@@ -118,33 +384,31 @@ class ExpandRules(PreProcessor):
     def __init__(self, config):
         super().__init__(config)
 
-    def get_function(self, type):
+    def output_prefix(self, feature):
+        # the number of expanded columns depends on the data
+        return f'{feature}_'
+
+    def get_function(self, definition):
+        # 'columns' / 'pivot', or { 'type': 'columns', 'width': 20 } to pad with NaN or truncate
+        type = definition if np.isscalar(definition) else definition.get('type')
+        width = None if np.isscalar(definition) else definition.get('width', None)
+
         if type == "columns":
             def _expand(name, x):
-                expanded_features = {}
-                for i, values in enumerate(x):
-                    for j, value in enumerate(values):
-                        new_feature_name = f'{name}_{j}'
-                        expand = expanded_features.get(new_feature_name, [])
-                        expand.append(value)
-                        expanded_features[new_feature_name] = expand
-                return expanded_features
+                # one preallocated block, column j holds element j of every row
+                x = RaggedArray.of(x)
+                block = x.padded(width=width)
+                columns = [f'{name}_{j}' for j in range(block.shape[1])]
+                return pd.DataFrame(block, index=x.index, columns=columns)
             return _expand
 
         if type == "pivot":
             def _expand(name, x):
-                expanded_features = {}
-
-                for i, values in enumerate(x):
-                    new_feature_name = f'{name}_{i}'
-                    for j, value in enumerate(values):
-                        expand = expanded_features.get(new_feature_name, None)
-                        if expand is None:
-                            expand = []
-                            expanded_features[new_feature_name] = expand
-                        expand.append(value)
-
-                return expanded_features
+                # column i holds the values of row i, fitted to the length of the frame
+                x = RaggedArray.of(x)
+                block = x.padded(width=len(x)).T
+                columns = [f'{name}_{i}' for i in range(block.shape[1])]
+                return pd.DataFrame(block, index=x.index, columns=columns)
 
             return _expand
         else:
@@ -155,97 +419,186 @@ class ExpandRules(PreProcessor):
 class ClassifyRules(PreProcessor):
     def __init__(self, config):
         super().__init__(config)
-        self.classifiers = {
-            "linear_regression": LinearRegression,
-            "decision_tree": DecisionTreeClassifier,
-            "random_forest": RandomForestClassifier,
-            "svm": SVC,
-            "logistic_regression": LogisticRegression,
-            "knn": KNeighborsClassifier,
-            "naive_bayes": GaussianNB,
-            "neural_network": MLPClassifier,
-            "gradient_boosting": GradientBoostingClassifier,
-        }
+        # import paths, an estimator's module is imported the first time a rule uses it
+        self.classifiers = engines.CLASSIFIERS
 
     def get_classifier(self, method, params):
         """
         Returns an instance of the specified classifier with the given parameters.
         """
-        classifier_class = self.classifiers.get(method)
-        if classifier_class:
-            return classifier_class(**params)
+        if method in self.classifiers:
+            return engines.estimator(method, self.classifiers)(**params)
         else:
             raise ValueError(f"Unsupported classification method: {method}")
 
-    def apply(self, df, target_label):
+    def apply(self, df, target_label, copy=True):
         # apply all rules and return new data
-        new_features = []
+        results = []
         for feature, rule_function in sorted(self.rules.items()):
             #if feature in df.columns:
-            results = rule_function(feature, df[feature], df[target_label])
-            for key, val in sorted(results.items()):
-                new_features.append(key)
-                df[key] = val
-        return df, new_features
+            results.append(rule_function(feature, df[feature], df[target_label]))
+        return self.materialize(df, results, copy)
+
+    def run_rule(self, feature, df, target_label):
+        return self.rules[feature](feature, df[feature], df[target_label])
+
+    def output_names(self, feature, definition):
+        method = definition.get('method', 'decision_tree')
+        return [f'{method}_{feature}_{summary}' for summary in ['next', 'min', 'max', 'mean']]
 
     def get_function(self, definition):
+        if definition.get('method', 'decision_tree') == 'linear_regression' and \
+                set(definition.get('params', {})) <= {'fit_intercept', 'positive', 'copy_X', 'n_jobs'}:
+            # closed form lag-1 fit computed for every row at once
+            return self.get_linear_regression(definition)
         return self.get_function_v3(definition)
 
-    def get_function_v3(self, definition):
+    def get_linear_regression(self, definition):
+        """
+        Batched equivalent of get_function_v3 for linear_regression: the per-row fit
+        y[t+1] ~ y[t] has a closed form, slope = Sxy / Sxx and intercept = mean(y) - slope * mean(x),
+        evaluated with segment-wise reductions over the ragged column.
+        """
+        params = definition.get('params', {})
+        fit_intercept = params.get('fit_intercept', True)
+        positive = params.get('positive', False)
+
         def _func(name, x, target_col):
-            classifier_method = definition.get('method', 'decision_tree')
-            classifier_params = definition.get('params', {})
+            classifier_method = definition.get('method')
+            predictions = {
+                f'{classifier_method}_{name}_next': np.full(len(x), np.nan),
+                f'{classifier_method}_{name}_min': np.full(len(x), np.nan),
+                f'{classifier_method}_{name}_max': np.full(len(x), np.nan),
+                f'{classifier_method}_{name}_mean': np.full(len(x), np.nan),
+            }
 
-            # Initialize an empty Series to store predictions
-            predictions_next = pd.Series(index=x.index)
-            predictions_mean = pd.Series(index=x.index)
-            predictions_min = pd.Series(index=x.index)
-            predictions_max = pd.Series(index=x.index)
+            # like the per-row loop, stop at the first invalid (scalar) row
+            valid = len(x)
+            for i, values in enumerate(x.values):
+                if np.isscalar(values):
+                    valid = i
+                    break
 
-            # Get the classifier instance
-            classifier = self.get_classifier(classifier_method, classifier_params)
+            if valid > 0:
+                ragged = RaggedArray.from_series(x.iloc[:valid])
+                slope, intercept = self._lag_regression(ragged, fit_intercept, positive)
 
-            # Iterate over each row in the column x
-            for idx, values in x.items():
+                # predict every element of each row, then reduce the predictions per row
+                predicted = ragged.broadcast(slope) * ragged.values + ragged.broadcast(intercept)
+                predicted = RaggedArray(predicted, ragged.offsets)
+                predictions[f'{classifier_method}_{name}_next'][:valid] = predicted.last()
+                predictions[f'{classifier_method}_{name}_min'][:valid] = predicted.min()
+                predictions[f'{classifier_method}_{name}_max'][:valid] = predicted.max()
+                predictions[f'{classifier_method}_{name}_mean'][:valid] = predicted.mean()
 
-                if np.isscalar(values):
-                    # invalid input
-                    break
+            # Return the predictions as new features
+            return {key: pd.Series(val, index=x.index) for key, val in predictions.items()}
 
-                # Flatten the values into a DataFrame with a single column
-                flattened_df = pd.DataFrame({
-                    name: np.repeat(idx, len(values)),
-                    f'{name}_value': values
-                })
+        return _func
 
-                # print("Flattened DF:")
-                # print(flattened_df.to_string(index=False))
+    def _lag_regression(self, ragged, fit_intercept, positive):
+        # pair every element with its successor inside the same row: x = y[:-1], y = y[1:]
+        nonempty = ragged.lengths > 0
+        is_first = np.zeros(len(ragged.values), dtype=bool)
+        is_last = np.zeros(len(ragged.values), dtype=bool)
+        is_first[ragged.starts[nonempty]] = True
+        is_last[ragged.ends[nonempty] - 1] = True
+        pair_offsets = np.zeros(len(ragged) + 1, dtype=np.int64)
+        np.cumsum(np.maximum(ragged.lengths - 1, 0), out=pair_offsets[1:])
+
+        pairs_x = RaggedArray(ragged.values[~is_last].astype(np.float64), pair_offsets)
+        pairs_y = RaggedArray(ragged.values[~is_first].astype(np.float64), pair_offsets)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if fit_intercept:
+                # centered two-pass sums keep the fit precise for large, slowly moving values
+                mean_x, mean_y = pairs_x.mean(), pairs_y.mean()
+                dx = pairs_x.values - pairs_x.broadcast(mean_x)
+                dy = pairs_y.values - pairs_y.broadcast(mean_y)
+            else:
+                mean_x, mean_y = 0.0, 0.0
+                dx, dy = pairs_x.values, pairs_y.values
+            sxx = pairs_x.reduce_values(np.add, dx * dx, empty=0)
+            sxy = pairs_x.reduce_values(np.add, dx * dy, empty=0)
+
+            # a constant input has no unique solution, lstsq returns slope 0 (minimum norm)
+            slope = np.where(sxx == 0, 0.0, sxy / sxx)
+            if positive:
+                slope = np.maximum(slope, 0.0)
+            intercept = mean_y - slope * mean_x
+
+        # rows with less than 2 values can not be fit
+        too_short = ragged.lengths < 2
+        slope = np.where(too_short, np.nan, slope)
+        intercept = np.where(too_short, np.nan, intercept)
+        return slope, intercept
 
-                # Train the classifier on the flattened DataFrame and make predictions
-                fitted = classifier.fit(flattened_df[[f'{name}_value']][:-1], flattened_df[f'{name}_value'][1:])
-#                 fitted = classifier.fit(flattened_df[[f'{name}_value']], flattened_df[f'{name}_value'])
-                predictions = fitted.predict(flattened_df[[f'{name}_value']])
+    def get_function_v3(self, definition):
+        def _func(name, x, target_col):
+            classifier_method = definition.get('method', 'decision_tree')
+            classifier_params = self._seeded_params(classifier_method, definition.get('params', {}), definition.get('seed'))
+            workers = definition.get('workers', 1)
 
-                # print("PREDICTIONS NP-ARRAY:")
-                # print(predictions)
+            # like the original loop, stop at the first invalid (scalar) row
+            valid = len(x)
+            for i, values in enumerate(x.values):
+                if np.isscalar(values):
+                    valid = i
+                    break
 
-                predictions_next[idx] = predictions[-1]
-                predictions_mean[idx] = predictions.mean()
-                predictions_max[idx] = predictions.max()
-                predictions_min[idx] = predictions.min()
+            predictions = np.full((len(x), 4), np.nan)
+            if valid > 0:
+                ragged = RaggedArray.from_series(x.iloc[:valid])
+                if workers > 1 and valid > 1:
+                    predictions[:valid] = self._fit_rows_parallel(ragged, classifier_method, classifier_params,
+                                                                  workers, definition.get('chunk_size'))
+                else:
+                    # Get the classifier instance, refit for every row
+                    classifier = self.get_classifier(classifier_method, classifier_params)
+                    predictions[:valid] = _fit_rows(classifier, ragged.values, ragged.offsets)
 
             # Return the predictions as new features
             new_features = {
-                f'{classifier_method}_{name}_next': predictions_next,
-                f'{classifier_method}_{name}_min': predictions_min,
-                f'{classifier_method}_{name}_max': predictions_max,
-                f'{classifier_method}_{name}_mean': predictions_mean,
+                f'{classifier_method}_{name}_next': pd.Series(predictions[:, 0], index=x.index),
+                f'{classifier_method}_{name}_min': pd.Series(predictions[:, 1], index=x.index),
+                f'{classifier_method}_{name}_max': pd.Series(predictions[:, 2], index=x.index),
+                f'{classifier_method}_{name}_mean': pd.Series(predictions[:, 3], index=x.index),
             }
 
             return new_features
 
         return _func
 
+    def _seeded_params(self, method, params, seed):
+        # a rule level seed fixes random_state for estimators that take one, unless set explicitly
+        if seed is None or 'random_state' in params:
+            return params
+        if 'random_state' not in self.get_classifier(method, {}).get_params():
+            return params
+        return {**params, 'random_state': seed}
+
+    def _fit_rows_parallel(self, ragged, method, params, workers, chunk_size=None):
+        """
+        Fit the per-row models on a process pool. The ragged values are placed in shared memory
+        once, each task receives only its slice of the offsets and builds its own estimator.
+        Rows are fit independently, so the results do not depend on the chunking.
+        """
+        chunk_size = chunk_size or -(-len(ragged) // workers)
+        values = np.ascontiguousarray(ragged.values)
+        shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        try:
+            np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_fit_rows_shared, shm.name, values.dtype.str, len(values),
+                                    ragged.offsets[start:start + chunk_size + 1], method, params)
+                    for start in range(0, len(ragged), chunk_size)
+                ]
+                return np.concatenate([future.result() for future in futures])
+        finally:
+            shm.close()
+            shm.unlink()
+
     def get_function_v2(self, definition):
         def _func(name, x, target_col):
             classifier_method = definition.get('method', 'decision_tree')
@@ -294,68 +647,135 @@ class ClassifyRules(PreProcessor):
 
         return _func
 
+def _fit_rows(classifier, values, offsets):
+    # fit y[t+1] ~ y[t] for every row and summarize the predictions: next, min, max, mean
+    results = np.full((len(offsets) - 1, 4), np.nan)
+    for i in range(len(offsets) - 1):
+        row = values[offsets[i]:offsets[i + 1]]
+        X = row.reshape(-1, 1)
+        predictions = classifier.fit(X[:-1], row[1:]).predict(X)
+        results[i] = (predictions[-1], predictions.min(), predictions.max(), predictions.mean())
+    return results
+
+def _fit_rows_shared(shm_name, dtype, size, offsets, method, params):
+    # process pool task, reads the rows from shared memory and fits with its own estimator
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        classifier = ClassifyRules({}).get_classifier(method, params)
+        return _fit_rows(classifier, np.ndarray((size,), dtype=np.dtype(dtype), buffer=shm.buf), offsets)
+    finally:
+        shm.close()
+
+
 class FlattenRules(PreProcessor):
 
     def __init__(self, config):
         super().__init__(config)
 
+    def output_names(self, feature, definition):
+        types = [definition] if np.isscalar(definition) else definition
+        return [f'{type}_{feature}' for type in types]
+
     def get_function(self, definition):
         if np.isscalar(definition):
             return self.get_flattener(definition)
+
+        # resolve every requested flattener once, when the rules are built
+        flatteners = [self.get_flattener(func_type_name) for func_type_name in definition]
+
         def _flatten_function(name, input):
+            # fused: all stats for the column reduce one ragged buffer and share intermediates,
+            # e.g. avg reuses sum and count, norm reuses min and max
+            ragged = RaggedArray.of(input)
             results = {}
-            for func_type_name in definition:
-                results.update(self.get_flattener(func_type_name)(name, input))
+            for flattener in flatteners:
+                results.update(flattener(name, ragged))
             return results
         return _flatten_function
 
 
     def get_flattener(self, type):
         if type == "norm":
-            def normalize(y):
-                if np.all(np.isfinite(y)):
-                    if np.min(y) == np.max(y): return 0.0
-                    values = ((y - np.min(y))**2 / (np.max(y) - np.min(y)))
-                    return sum(values) / len(values)
-                else:
-                    return avg(y)
             def _func(name, x):
-                return {f'norm_{name}': x.apply(normalize)}
+                x = RaggedArray.of(x)
+                y_min, y_max = x.min(), x.max()
+                finite = x.finite()
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    span = y_max - y_min
+                    values = (x.values - x.broadcast(y_min))**2 / x.broadcast(span)
+                    normalized = x.reduce_values(np.add, values, empty=0) / x.count()
+                    normalized = np.where(span == 0, 0.0, normalized)
+                    # non-finite rows fall back to the plain average
+                    normalized = np.where(finite, normalized, x.mean())
+                return {f'norm_{name}': x.series(normalized)}
             return _func
         elif type == "min":
             def _func(name, x):
-                return {f'min_{name}': x.apply(lambda y: min(y))}
+                x = RaggedArray.of(x)
+                return {f'min_{name}': x.series(x.min())}
             return _func
         elif type == "max":
             def _func(name, x):
-                return {f'max_{name}': x.apply(lambda y: max(y))}
+                x = RaggedArray.of(x)
+                return {f'max_{name}': x.series(x.max())}
             return _func
         elif type == "sum":
             def _func(name, x):
-                return {f'sum_{name}': x.apply(lambda y: sum(y))}
+                x = RaggedArray.of(x)
+                return {f'sum_{name}': x.series(x.sum())}
             return _func
         elif type == "avg":
             def _avg(name, x):
-                return {f'avg_{name}': x.apply(lambda y: sum(y) / len(y))}
+                x = RaggedArray.of(x)
+                return {f'avg_{name}': x.series(x.mean())}
             return _avg
         elif type == "log":
             def _log(name, x):
-                return {f'log_{name}': x.apply(lambda y: np.log1p(y))}  # Example: log(1 + x)
+                x = RaggedArray.of(x)
+                return {f'log_{name}': x.series(x.split(np.log1p(x.values)))}  # Example: log(1 + x)
             return _log
         elif type == 'mean':
             def _mean(name, x):
-                return {f'mean_{name}': x.apply(lambda y: np.mean(y))}
+                x = RaggedArray.of(x)
+                return {f'mean_{name}': x.series(x.mean())}
             return _mean
         elif type == 'first':
             def _first(name, x):
-                return {f'first_{name}': x.apply(lambda y: y[0])}
+                x = RaggedArray.of(x)
+                return {f'first_{name}': x.series(x.first())}
             return _first
         elif type == 'last':
             def _last(name, x):
-                return {f'last_{name}': x.apply(lambda y: y[-1])}
+                x = RaggedArray.of(x)
+                return {f'last_{name}': x.series(x.last())}
             return _last
+        elif type.startswith('rolling_') or type.startswith('ewma_'):
+            return self.get_window_flattener(type)
         else:
             # Unknown rule type
             # return lambda x: None
             raise Exception(f"Unsupported rule type {type}")
 
+    def get_window_flattener(self, type):
+        """
+        Sliding window rules named rolling_<mean|std|min|max>_<window> or ewma_<span>.
+        Each row becomes the array of window values, e.g. rolling_mean_5 of a 30 element
+        history is 26 window means. Use a flatten stage (first, last, ...) to reduce it further.
+        """
+        operation, _, size = type.rpartition('_')
+        windows = {
+            'rolling_mean': RaggedArray.rolling_mean,
+            'rolling_std': RaggedArray.rolling_std,
+            'rolling_min': RaggedArray.rolling_min,
+            'rolling_max': RaggedArray.rolling_max,
+            'ewma': RaggedArray.ewma,
+        }
+        if operation not in windows or not size.isdigit() or int(size) < 1:
+            raise Exception(f"Unsupported rule type {type}")
+
+        window_function = windows[operation]
+        size = int(size)
+        def _window(name, x):
+            x = RaggedArray.of(x)
+            return {f'{type}_{name}': x.series(window_function(x, size).split())}
+        return _window
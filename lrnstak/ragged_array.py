@@ -0,0 +1,281 @@
+import functools
+import numpy as np
+import pandas as pd
+
+
+def _shared(method):
+    # per-row statistics are computed once per ragged array and shared by every consumer
+    @functools.wraps(method)
+    def _method(self):
+        found = self._stats.get(method.__name__)
+        if found is None:
+            found = method(self)
+            self._stats[method.__name__] = found
+        return found
+    return _method
+
+
+class RaggedArray:
+    """
+    Column of variable length arrays stored as one flat values buffer plus row offsets.
+    Row i spans values[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, values, offsets, index=None):
+        self.values = values
+        self.offsets = offsets
+        self.index = index if index is not None else pd.RangeIndex(len(offsets) - 1)
+        self.lengths = np.diff(offsets)
+        self.starts = offsets[:-1]
+        self.ends = offsets[1:]
+        self._stats = {}
+        # equal length rows are viewed as a 2-D block so reductions can run along axis 1
+        self.width = None
+        if len(self.lengths) > 0 and self.lengths[0] > 0 and np.all(self.lengths == self.lengths[0]):
+            self.width = int(self.lengths[0])
+
+    @classmethod
+    def of(cls, x):
+        if isinstance(x, RaggedArray):
+            return x
+        return cls.from_series(x)
+
+    @classmethod
+    def from_series(cls, x):
+        rows = x.values if isinstance(x, pd.Series) else x
+        index = x.index if isinstance(x, pd.Series) else None
+
+        lengths = np.empty(len(rows), dtype=np.int64)
+        for i, row in enumerate(rows):
+            if np.isscalar(row) or row is None:
+                raise ValueError(f"Expected a list value in every row, found {row!r} at row {i}")
+            lengths[i] = len(row)
+
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        if len(rows) > 0 and lengths[0] > 0 and np.all(lengths == lengths[0]):
+            # fast path, rows of equal length convert straight into a 2-D block
+            values = np.asarray(list(rows)).reshape(-1)
+        elif offsets[-1] > 0:
+            values = np.concatenate([np.asarray(row).reshape(-1) for row in rows])
+        else:
+            values = np.empty(0, dtype=np.float64)
+
+        if values.dtype == object:
+            values = values.astype(np.float64)
+
+        return cls(values, offsets, index)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    @property
+    def matrix(self):
+        if self.width is None:
+            return None
+        return self.values.reshape(len(self), self.width)
+
+    def row_ids(self):
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def series(self, data):
+        # copy so columns built from shared statistics never alias each other
+        return pd.Series(data, index=self.index, copy=True)
+
+    def reduce(self, ufunc, empty=np.nan):
+        """
+        Segment reduction of every row with a numpy ufunc (np.add, np.minimum, np.maximum, ...).
+        Empty rows are filled with the `empty` value. np.add sums in numpy's order, not the left to
+        right order of the builtin sum, so float sums can differ from it in the last digits.
+        """
+        if self.width is not None:
+            return ufunc.reduce(self.matrix, axis=1)
+
+        nonempty = self.lengths > 0
+        if len(self) == 0:
+            return np.empty(0, dtype=np.result_type(self.values.dtype, empty))
+        if np.all(nonempty):
+            return ufunc.reduceat(self.values, self.starts)
+
+        result = np.full(len(self), empty, dtype=np.result_type(self.values.dtype, empty))
+        if np.any(nonempty):
+            # empty rows add nothing between consecutive non-empty starts, so they can be dropped
+            result[nonempty] = ufunc.reduceat(self.values, self.starts[nonempty])
+        return result
+
+    def reduce_values(self, ufunc, values, empty=np.nan):
+        """
+        Segment reduction of an element-wise derived buffer that shares this array's offsets.
+        """
+        return RaggedArray(values, self.offsets, self.index).reduce(ufunc, empty)
+
+    @_shared
+    def sum(self):
+        return self.reduce(np.add, empty=0)
+
+    @_shared
+    def min(self):
+        return self.reduce(np.minimum)
+
+    @_shared
+    def max(self):
+        return self.reduce(np.maximum)
+
+    def count(self):
+        return self.lengths
+
+    @_shared
+    def finite(self):
+        return self.reduce_values(np.logical_and, np.isfinite(self.values), empty=True)
+
+    @_shared
+    def mean(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.sum() / self.lengths
+
+    @_shared
+    def first(self):
+        return self._take(self.starts)
+
+    @_shared
+    def last(self):
+        return self._take(self.ends - 1)
+
+    def _take(self, positions):
+        nonempty = self.lengths > 0
+        if np.all(nonempty):
+            return self.values[positions]
+        result = np.full(len(self), np.nan)
+        result[nonempty] = self.values[positions[nonempty]]
+        return result
+
+    def padded(self, fill=np.nan, width=None):
+        """
+        Left aligned 2-D copy of the rows, padded with `fill` (or truncated) to `width` columns.
+        """
+        width = int(self.lengths.max(initial=0)) if width is None else width
+        # the fill only widens the dtype when some row is actually padded
+        padding = np.any(self.lengths < width)
+        dtype = np.result_type(self.values.dtype, fill) if padding else self.values.dtype
+        if self.width is not None and self.width == width:
+            return self.matrix.astype(dtype)
+
+        block = np.empty((len(self), width), dtype=dtype)
+        if padding:
+            block.fill(fill)
+        lengths = np.minimum(self.lengths, width)
+        columns = np.arange(width)
+        mask = columns[None, :] < lengths[:, None]
+        # row-major boolean assignment fills each row's leading cells with its own values
+        positions = self.starts[:, None] + columns[None, :]
+        block[mask] = self.values[positions[mask]]
+        return block
+
+    def _from_block(self, block, lengths):
+        # keep the leading `lengths[i]` cells of each block row as a new ragged array
+        lengths = np.maximum(lengths, 0)
+        mask = np.arange(block.shape[1])[None, :] < lengths[:, None]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return RaggedArray(block[mask], offsets, self.index)
+
+    def rolling_mean(self, window):
+        total, _, shift, full = self._rolling_sums(window)
+        return self._from_block(np.where(full, total / window + shift, np.nan), self.lengths - window + 1)
+
+    def rolling_std(self, window):
+        """
+        Sample standard deviation (ddof=1) of every full window, same as pandas rolling().std().
+        """
+        # the variance is shift invariant, so it is computed from the shifted sums directly
+        total, squares, _, full = self._rolling_sums(window)
+        if window < 2:
+            return self._from_block(np.full(total.shape, np.nan), self.lengths - window + 1)
+        variance = (squares - total**2 / window) / (window - 1)
+        return self._from_block(np.where(full, np.sqrt(np.maximum(variance, 0)), np.nan), self.lengths - window + 1)
+
+    def rolling_min(self, window):
+        return self._from_block(self._rolling_extreme(window, np.minimum, np.inf), self.lengths - window + 1)
+
+    def rolling_max(self, window):
+        return self._from_block(self._rolling_extreme(window, np.maximum, -np.inf), self.lengths - window + 1)
+
+    def ewma(self, span):
+        """
+        Exponentially weighted moving average, same as pandas ewm(span=span, adjust=False).mean().
+        """
+        alpha = 2.0 / (span + 1.0)
+        block = self.padded().astype(np.float64)
+        if block.shape[1] == 0:
+            return self._from_block(block, self.lengths)
+        # weight of the average so far, a NaN keeps the average but still decays its weight
+        # (pandas' ignore_na=False), values before the first observation stay NaN
+        average = block[:, 0].copy()
+        weight = np.where(np.isnan(average), 0.0, 1.0)
+        # one recurrence step per column, each step vectorized across all rows
+        for j in range(1, block.shape[1]):
+            value = block[:, j]
+            observed = ~np.isnan(value)
+            started = ~np.isnan(average)
+            weight *= 1 - alpha
+            update = observed & started
+            average[update] = (weight[update] * average[update] + alpha * value[update]) / (weight[update] + alpha)
+            first = observed & ~started
+            average[first] = value[first]
+            weight[observed] = 1.0
+            block[:, j] = average
+        return self._from_block(block, self.lengths)
+
+    def _rolling_sums(self, window):
+        # window sums from differences of running sums, O(n) regardless of the window size
+        block = self.padded().astype(np.float64)
+        if block.shape[1] < window:
+            empty = np.empty((len(self), 0))
+            return empty, empty, np.zeros((len(self), 1)), np.empty((len(self), 0), dtype=bool)
+        # shift each row by its first value to keep the running sums small and precise
+        shift = block[:, :1].copy()
+        shift[~np.isfinite(shift)] = 0
+        block -= shift
+        # NaN adds nothing to the running sums, like pandas only the windows holding one are NaN
+        valid = ~np.isnan(block)
+        block[~valid] = 0
+        width = block.shape[1]
+        running = np.zeros((len(self), width + 1))
+        np.cumsum(block, axis=1, out=running[:, 1:])
+        squares = np.zeros((len(self), width + 1))
+        np.cumsum(block**2, axis=1, out=squares[:, 1:])
+        counts = np.zeros((len(self), width + 1), dtype=np.int64)
+        np.cumsum(valid, axis=1, out=counts[:, 1:])
+        total = running[:, window:] - running[:, :-window]
+        total_squares = squares[:, window:] - squares[:, :-window]
+        full = counts[:, window:] - counts[:, :-window] == window
+        return total, total_squares, shift, full
+
+    def _rolling_extreme(self, window, ufunc, fill):
+        # van Herk/Gil-Werman: prefix and suffix extremes inside blocks of `window` columns,
+        # every window spans at most two blocks so its extreme is one ufunc of two lookups
+        width = int(self.lengths.max(initial=0))
+        if width < window:
+            return np.empty((len(self), 0))
+        padded_width = -(-width // window) * window
+        block = self.padded(fill=fill, width=padded_width).reshape(len(self), -1, window)
+        prefix = ufunc.accumulate(block, axis=2).reshape(len(self), -1)
+        suffix = ufunc.accumulate(block[:, :, ::-1], axis=2)[:, :, ::-1].reshape(len(self), -1)
+        count = width - window + 1
+        return ufunc(suffix[:, :count], prefix[:, window - 1:window - 1 + count])
+
+    def broadcast(self, row_values):
+        """
+        Repeat one value per row across every element of that row.
+        """
+        return np.repeat(row_values, self.lengths)
+
+    def split(self, values=None):
+        """
+        Convert a buffer sharing this array's offsets back into one array per row.
+        """
+        values = self.values if values is None else values
+        if self.width is not None:
+            return list(values.reshape(len(self), self.width))
+        return np.split(values, self.offsets[1:-1])
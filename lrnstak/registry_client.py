@@ -5,6 +5,7 @@ import os
 import tempfile
 import joblib
 import time
+from lrnstak.processor_rules import Rules
 
 class Registry:
     def __init__(self, base_url = "http://registry:5000/models"):
@@ -33,6 +34,17 @@ class Registry:
             print(f"Error: {response.status_code} - {response.text}")
             return None, None, response.status_code
 
+    def get_training_data(self, model_name, version):
+        registry_url = f'{self.base_url}/{model_name}/{version}/training_data'
+
+        response = requests.get(registry_url)
+        if response.status_code == 200:
+            data = response.json()
+            return data.get('training_data', []), data.get('parameters', {}), 200
+        else:
+            print(f"Error: {response.status_code} - {response.text}")
+            return None, None, response.status_code
+
 
 class CachingRegistry(Registry):
     def __init__(self, base_url="http://registry:5000/models"):
@@ -46,21 +58,36 @@ class CachingRegistry(Registry):
         return time.time() > expires
 
     def get_and_cache(self, model_name, version):
+        model, parameters, rules, status_code = self.get_pipeline(model_name, version)
+        return model, parameters, status_code
+
+    def get_pipeline(self, model_name, version):
+        """
+        The model, its parameters and its rules compiled once when the model is loaded. They are
+        cached and evicted together.
+        """
+        key = f"{model_name}_{version}"
         # Check if the response is already in the cache
-        found = self.cache.get(f"{model_name}_{version}")
+        found = self.cache.get(key)
         if found and not self.__is_expired(found):
             return found['data']
+        if found:
+            # evict the expired model together with its compiled rules
+            self.cache.pop(key, None)
 
         # If not in the cache, retrieve from the parent class (Registry)
         model, parameters, status_code = self.get(model_name, version)
 
         # Cache the response for future use
         if status_code == 200:
+            rules = Rules(parameters.get('rules', {}))
+            # the schedule of the model's features is compiled up front too
+            rules.schedule(parameters.get('target_label', 'last_close'), parameters.get('feature_labels'))
             ttl = 600
-            self.cache[f'{model_name}_{version}'] = {
-                'data': (model, parameters, status_code),
+            self.cache[key] = {
+                'data': (model, parameters, rules, status_code),
                 'expires': time.time() + ttl
                 }
-            return model, parameters, status_code
+            return model, parameters, rules, status_code
 
         raise Exception(f"Error: {status_code}")
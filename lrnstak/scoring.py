@@ -0,0 +1,64 @@
+import numpy as np
+
+
+def _mape(y, y_pred, error):
+    # same as sklearn's mean_absolute_percentage_error, zero targets are clipped to epsilon
+    return float(np.mean(np.abs(error) / np.maximum(np.abs(y), np.finfo(np.float64).eps)))
+
+
+def _directional_accuracy(y, y_pred, error):
+    # share of steps where the prediction moves in the same direction as the actual value
+    if len(y) < 2:
+        return float('nan')
+    return float(np.mean(np.sign(y[1:] - y[:-1]) == np.sign(y_pred[1:] - y[:-1])))
+
+
+# metric plugins, each receives the aligned float64 targets, predictions and errors
+METRICS = {
+    'mape': _mape,
+    'directional_accuracy': _directional_accuracy,
+}
+
+
+class Scorer:
+    """
+    Scores precomputed predictions. Like the original sklearn based scoring, the prediction of
+    row t is compared with the target of row t + `lag` (1 by default, 0 for rows that are not
+    consecutive). mse, mae and r2 share one error buffer, the extra `metrics` are plugins from
+    METRICS computed on the same buffers.
+    """
+
+    def __init__(self, metrics=[]):
+        for name in metrics:
+            if name not in METRICS:
+                raise ValueError(f"Unsupported metric: {name}")
+        self.metrics = list(metrics)
+
+    def score(self, y, y_pred, lag=1):
+        y = np.ascontiguousarray(y, dtype=np.float64).reshape(-1)[lag:]
+        y_pred = np.ascontiguousarray(y_pred, dtype=np.float64).reshape(-1)
+        y_pred = y_pred[:len(y_pred) - lag]
+
+        error = y - y_pred
+        sse = float(np.dot(error, error))
+        mae = float(np.abs(error).sum())
+        n = len(error)
+
+        centered = y - y.mean() if n > 0 else y
+        sst = float(np.dot(centered, centered))
+        if n < 2:
+            r2 = float('nan')
+        elif sst > 0:
+            r2 = 1.0 - sse / sst
+        else:
+            # sklearn's r2_score for a constant target: 1 for a perfect prediction, else 0
+            r2 = 1.0 if sse == 0 else 0.0
+
+        score = {
+            'mse': sse / n if n > 0 else float('nan'),
+            'mae': mae / n if n > 0 else float('nan'),
+            'r2': r2,
+        }
+        for name in self.metrics:
+            score[name] = METRICS[name](y, y_pred, error)
+        return score
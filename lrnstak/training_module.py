@@ -1,22 +1,28 @@
+import os
 import sys
+import copy
+import json
+import time
 import requests
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from sklearn.tree import DecisionTreeRegressor
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.neighbors import KNeighborsRegressor
-from sklearn.neural_network import MLPRegressor
-import tensorflow as tf
+from lrnstak import engines
+from lrnstak.scoring import Scorer
 from lrnstak.processor_rules import Rules
 
+
+def _fit_model(engine, model, X, y):
+    # module level so it can run on a process pool, returns the fitted model
+    return engine.fit(model, X, y)
+
+
 class ModelTrainer:
 
     def __init__(self, parameters):
         self.engine = parameters.get('engine', 'default')
+        self.backend = engines.engine(self.engine, parameters)
         self.metadata = {
             'trained_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
             'engine': self.engine,
@@ -31,123 +37,448 @@ class ModelTrainer:
             'decision_tree': { 'random_state': 442 },
             'gradient_boosting': { },
         })
-        self.rules = Rules(parameters.get('rules', {}))
+        self.rules_definition = parameters.get('rules', {})
+        self.rules = Rules(self.rules_definition)
+        self.incremental = parameters.get('incremental', {})
+        # cores a training request may use, shared by concurrent candidates and their n_jobs
+        self.cpu_budget = int(parameters.get('cpu_budget', os.environ.get('LRNSTAK_CPU_BUDGET', os.cpu_count() or 1)))
+        self.executor = parameters.get('executor', 'thread')
+        self.selection = parameters.get('selection', {})
+        self.scorer = Scorer(parameters.get('metrics', []))
+        # candidate algorithms and the engine that trains each, `candidates` adds other engines' algorithms
+        self.estimators = {algorithm: self.backend for algorithm in self.backend.algorithms}
+        for name in parameters.get('candidates', []):
+            if name not in engines.ENGINES:
+                raise ValueError(f"Unsupported engine: {name}")
+            candidate = engines.engine(name, parameters)
+            # only engines trained through train_sk can join its candidates
+            if type(candidate).train is not engines.Engine.train:
+                raise ValueError(f"Engine {name} can not be a candidate, train it with engine: {name}")
+            for algorithm in candidate.algorithms:
+                self.estimators.setdefault(algorithm, candidate)
+        # engine of every candidate model by name, used for its predict and serialize hooks
+        self.model_engines = {}
+        # hyper parameters every candidate was created with, by name
+        self.model_params = {}
+        self.best_model_name = None
+        # preprocessed frames of this request, each with the raw input it was made from
+        self.preprocessed = []
+        self.preprocessing_stats = { 'hits': 0, 'misses': 0, 'seconds': 0.0, 'seconds_saved': 0.0 }
 
     def train(self, input_data, testing_data = None):
-        if self.engine == 'tensorflow':
-            return self.train_tf(input_data, testing_data)
-        return self.train_sk(input_data, testing_data)
+        return self.backend.train(self, input_data, testing_data)
+
+    def serialize(self, model, path):
+        self.model_engines.get(self.best_model_name, self.backend).serialize(model, path)
+
+    def train_incremental(self, previous, input_data, testing_data = None):
+        """
+        Continue training the previous version's model on the rows of `input_data` that are not in
+        its training data, `previous` holds its model, parameters and training_data. Only the new
+        rows are preprocessed. Falls back to a full training when the rules, engine, target or
+        features changed, or when the model can only be refit.
+        """
+        key = self.incremental.get('key')
+        seen = {self._row_key(row, key) for row in previous['training_data']}
+        new_rows = [row for row in input_data if self._row_key(row, key) not in seen]
+        incremental = { 'from_version': self.incremental.get('from_version'), 'rows': len(input_data), 'new_rows': len(new_rows) }
+
+        previous_parameters = previous['parameters']
+        unchanged = previous_parameters.get('rules', {}) == self.rules_definition \
+            and previous_parameters.get('engine', 'default') == self.engine \
+            and previous_parameters.get('target_label', 'last_close') == self.target_label
+
+        mode = None
+        if unchanged and len(new_rows) > 0:
+            df, added_features = self.preprocess(new_rows)
+            feature_cols = self.feature_cols + [feature for feature in added_features if feature not in self.feature_cols]
+            # the previous model was trained on exactly these columns
+            if feature_cols == previous_parameters.get('feature_labels') and all(col in df.columns for col in feature_cols):
+                model = previous['model']
+                model_name = self._algorithm_name(model)
+                engine = self.estimators.get(model_name, self.backend)
+                mode = engine.resume(model, df[feature_cols], df[self.target_label], len(new_rows) / max(1, len(input_data)))
+
+        if mode is None:
+            model, results = self.train(input_data, testing_data)
+            results['incremental'] = { **incremental, 'mode': 'full' }
+            return model, results
+
+        self.feature_cols[:] = feature_cols
+        self.model_engines[model_name] = engine
+        self.best_model_name = model_name
+
+        # the new rows are scored since the older ones were scored with the previous version
+        scores = [self._score(model, df[self.feature_cols], df[self.target_label], model_name, 1)]
+        if testing_data is not None:
+            td, _ = self.preprocess(testing_data)
+            scores.append(self._score(model, td[self.feature_cols], td[self.target_label], model_name, 2))
+        results = { model_name: scores[-1] }
+
+        return model, { 'metadata': self.metadata, 'scores': scores, 'results': results, 'preprocessing': dict(self.preprocessing_stats),
+                        'incremental': { **incremental, 'mode': mode } }
+
+    def _row_key(self, row, key):
+        # rows are matched by their `key` column, or by their whole content
+        return json.dumps(row[key] if key else row, sort_keys=True, default=str)
+
+    def _algorithm_name(self, model):
+        for algorithm, engine in self.estimators.items():
+            path = engines.ESTIMATORS.get(algorithm, '')
+            if path.rpartition('.')[2] == type(model).__name__:
+                return algorithm
+        return self.engine
 
     def train_sk(self, input_data, testing_data = None):
-        input_df = pd.DataFrame(input_data)
-        df, added_features = self.rules.apply(input_df, self.target_label)
+        from sklearn.model_selection import train_test_split
+
+        df, added_features = self.preprocess(input_data)
 
         self.feature_cols.extend(added_features)
         features = df[self.feature_cols]
         target = df[self.target_label]
 
         X_train, X_test, y_train, y_test = train_test_split(features, target, **self.split_params)
+        # the shuffled test rows are scored in time order against their own targets, the one row
+        # lag only applies to consecutive rows
+        X_test = X_test.sort_index()
+        y_test = y_test.loc[X_test.index]
 
-        models = {
-            'linear_regression': LinearRegression(**self.hyper_params.get('linear_regression', {})),
-            'random_forest': RandomForestRegressor(**self.hyper_params.get('random_forest', {})),
-            'decision_tree': DecisionTreeRegressor(**self.hyper_params.get('decision_tree', {})),
-            'gradient_boosting': GradientBoostingRegressor(n_estimators=300, learning_rate=0.1, max_depth=8, random_state=142, **self.hyper_params.get('gradient_boosting', {})),
-        }
+        scores = []
+        eliminated = {}
+        if self.selection.get('strategy') == 'successive_halving':
+            # hyper parameter lists are searched, only the surviving candidates are fully trained
+            models = self._successive_halving(X_train, y_train, X_test, y_test, scores, eliminated)
+        else:
+            models = {algorithm: self._create(algorithm, algorithm, self.hyper_params.get(algorithm, {})) for algorithm in self.estimators}
+
+            ## fit with training data, candidates train concurrently within the cpu budget
+            self._fit_candidates(models, X_train, y_train)
+
+        if testing_data is not None:
+            td, _ = self.preprocess(testing_data)
 
         # Train, test, and evaluate each model
         results = {}
-        scores = []
         for model_name, model in models.items():
-            ## fit with training data
-            model.fit(X_train, y_train)
-
-            y_pred = model.predict(X_test)
-
-            score = self._score(model, X_test, y_pred, model_name, 1)
+            score = self._score(model, X_test, y_test, model_name, 1, lag=0)
             scores.append(score)
 
             if testing_data is not None:
                 # test the model against the testing data provided and score the results
-                td, _ = self.rules.apply(pd.DataFrame(testing_data), self.target_label)
                 score = self._score(model, td[self.feature_cols], td[self.target_label], model_name, 2)
                 scores.append(score)
 
             results[model_name] = score
 
-        best_model_name = min(results, key=lambda model_name: (results[model_name]['mse'], results[model_name]['mae']))
+        # only fully trained candidates can be selected, eliminated ones report their last round
+        best_model_name = min(models, key=lambda model_name: (results[model_name]['mse'], results[model_name]['mae']))
         best_model = models[best_model_name]
+        self.best_model_name = best_model_name
+        results.update(eliminated)
+
+        return best_model, { 'metadata': self.metadata, 'scores': scores, 'results': results, 'preprocessing': dict(self.preprocessing_stats) }
+
+    def _create(self, name, algorithm, params):
+        engine = self.estimators.get(algorithm, self.backend)
+        self.model_engines[name] = engine
+        self.model_params[name] = params
+        return engine.create(algorithm, params)
+
+    def _candidate_grid(self):
+        from sklearn.model_selection import ParameterGrid
+
+        # every combination of list valued hyper parameters is a candidate, e.g. random_forest_0, random_forest_1
+        candidates = {}
+        for algorithm in self.estimators:
+            hyper = self.hyper_params.get(algorithm, {})
+            grid = list(ParameterGrid({key: val if isinstance(val, list) else [val] for key, val in hyper.items()}))
+            for i, params in enumerate(grid):
+                candidates[algorithm if len(grid) == 1 else f'{algorithm}_{i}'] = (algorithm, params)
+        return candidates
+
+    def _successive_halving(self, X_train, y_train, X_test, y_test, scores, eliminated):
+        """
+        Successive halving over the candidate grid. Every round fits the surviving candidates on a
+        growing share of the resource (training rows, or n_estimators with resource=n_estimators),
+        ranks them by (mse, mae) on the test split and keeps the best 1/eta. The last round uses the
+        full resource. Round scores are appended to `scores`, the score of the round each dropped
+        candidate was eliminated in goes to `eliminated`, the fitted survivors are returned.
+        """
+        eta = self.selection.get('eta', 3)
+        resource = self.selection.get('resource', 'samples')
+        candidates = self._candidate_grid()
+        rounds = max(1, int(np.ceil(np.log(len(candidates)) / np.log(eta))) + 1)
+        min_fraction = self.selection.get('min_resource', 1.0 / eta**(rounds - 1))
+
+        survivors = list(candidates)
+        models = {}
+        for round in range(rounds):
+            fraction = 1.0 if round == rounds - 1 else min(1.0, min_fraction * eta**round)
+            size = max(2, int(len(X_train) * fraction)) if resource == 'samples' else len(X_train)
+
+            models = {}
+            for name in survivors:
+                algorithm, params = candidates[name]
+                if resource == 'n_estimators':
+                    # ensembles grow n_estimators, boosted histograms max_iter
+                    defaults = self._create(name, algorithm, params).get_params()
+                    for key in ['n_estimators', 'max_iter']:
+                        if key in defaults:
+                            params = { **params, key: max(1, int(defaults[key] * fraction)) }
+                models[name] = self._create(name, algorithm, params)
+            self._fit_candidates(models, X_train[:size], y_train[:size])
+
+            ranked = []
+            for name, model in models.items():
+                score = self._score(model, X_test, y_test, name, 1, lag=0)
+                score['round'] = round
+                score['resource'] = fraction
+                score['params'] = candidates[name][1]
+                scores.append(score)
+                ranked.append(((score['mse'], score['mae']), name))
+
+            if round < rounds - 1:
+                keep = max(1, int(np.ceil(len(survivors) / eta)))
+                survivors = [name for _, name in sorted(ranked)[:keep]]
+                for score in scores[-len(ranked):]:
+                    if score['algorithm'] not in survivors:
+                        eliminated[score['algorithm']] = score
 
-        return best_model, { 'metadata': self.metadata, 'scores': scores, 'results': results }
+        return models
+
+    def preprocess(self, data):
+        """
+        Run the rules over a raw dataset once per request. Repeated calls with the same input
+        object return the cached frame (which callers must not modify) and count as a hit.
+        """
+        # matched by identity against the inputs kept in the cache, never by a reusable id()
+        for found in self.preprocessed:
+            if found[0] is data:
+                self.preprocessing_stats['hits'] += 1
+                self.preprocessing_stats['seconds_saved'] += found[3]
+                return found[1], found[2]
+
+        started = time.perf_counter()
+        df, added_features = self.rules.apply(pd.DataFrame(data), self.target_label, copy=True)
+        added_features = [feature for feature in added_features if self._scalar(df[feature])]
+        elapsed = time.perf_counter() - started
+
+        self.preprocessed.append((data, df, added_features, elapsed))
+        self.preprocessing_stats['misses'] += 1
+        self.preprocessing_stats['seconds'] += elapsed
+        return df, added_features
+
+    def _scalar(self, column):
+        # array valued outputs (e.g. rolling windows read by a later stage) are not model features
+        if column.dtype != object:
+            return True
+        return not column.map(lambda value: isinstance(value, (list, tuple, np.ndarray))).any()
+
+    def _fit_candidates(self, models, X, y):
+        """
+        Fit every candidate model in place of the `models` dict. Up to `cpu_budget` candidates
+        train at once on a thread or process pool (`executor`), estimators that take n_jobs
+        share the remaining cores unless their hyper parameters set n_jobs.
+        """
+        workers = max(1, min(len(models), self.cpu_budget))
+        n_jobs = max(1, self.cpu_budget // workers)
+        for model_name, model in models.items():
+            # grid candidates (random_forest_0, ...) keep an n_jobs set in their algorithm's hyper parameters
+            if 'n_jobs' in model.get_params() and 'n_jobs' not in self.model_params.get(model_name, self.hyper_params.get(model_name, {})):
+                model.set_params(n_jobs=n_jobs)
+
+        if workers == 1:
+            for model_name, model in models.items():
+                _fit_model(self.model_engines.get(model_name, self.backend), model, X, y)
+            return models
+
+        executor_class = ProcessPoolExecutor if self.executor == 'process' else ThreadPoolExecutor
+        with executor_class(max_workers=workers) as executor:
+            futures = {model_name: executor.submit(_fit_model, self.model_engines.get(model_name, self.backend), model, X, y) for model_name, model in models.items()}
+            for model_name, future in futures.items():
+                try:
+                    # a process pool returns fitted copies
+                    models[model_name] = future.result()
+                except Exception as e:
+                    # candidates that have not started are dropped, the pool shuts down with the error
+                    for pending in futures.values():
+                        pending.cancel()
+                    raise ValueError(f"Training {model_name} failed: {e}") from e
+        return models
 
     def train_tf(self, input_data, testing_data = None):
+        from sklearn.model_selection import train_test_split
 
-        input_df = pd.DataFrame(input_data)
-        df, added_features = self.rules.apply(input_df, self.target_label)
+        df, added_features = self.preprocess(input_data)
         self.feature_cols.extend(added_features)
 
         features = df[self.feature_cols]
         target = df[self.target_label]
 
-        X_train, X_test, y_train, y_test = train_test_split(features, target, **self.split_params)
+        # float32 features feed the tf.data pipelines, the split is kept as row positions
+        X = features.to_numpy(dtype=np.float32)
+        y = target.to_numpy(dtype=np.float64)
+        train_rows, test_rows = train_test_split(np.arange(len(df)), **self.split_params)
 
-        models = {
-            # 'tf_rnn': tf.keras.Sequential([
-            #     tf.keras.layers.LSTM(64, input_shape=(None,len(self.feature_cols))),
-            #     tf.keras.layers.Dense(1)
-            # ]),
-            'tf_relu': tf.keras.Sequential([
-                tf.keras.layers.Dense(64, activation='relu', input_shape=(len(self.feature_cols),)),
-                tf.keras.layers.Dense(1)
-            ]),
-            'tf_sigmoid': tf.keras.Sequential([
-                tf.keras.layers.Dense(64, activation='sigmoid', input_shape=(len(self.feature_cols),)),
-                tf.keras.layers.Dense(1)
-            ]),
-            'tf_tanh': tf.keras.Sequential([
-                tf.keras.layers.Dense(64, activation='tanh', input_shape=(len(self.feature_cols),)),
-                tf.keras.layers.Dense(1)
-            ]),
-        }
+        if testing_data is not None:
+            td, _ = self.preprocess(testing_data)
+            X_td = td[self.feature_cols].to_numpy(dtype=np.float32)
+            y_td = td[self.target_label].to_numpy(dtype=np.float64)
 
-        # compile
-        for model_name, model in models.items():
-            ## fit with training data
-            model.compile(optimizer='adam', loss='mse')
+        features_count = len(self.feature_cols)
+        # early stopping watches rows held out of the training split, the test split stays unseen
+        validation = None
+        if self.backend.validation_fraction > 0 and len(train_rows) * self.backend.validation_fraction >= 1:
+            train_rows, validation_rows = train_test_split(train_rows, test_size=self.backend.validation_fraction, random_state=self.backend.seed)
+            validation = (X[validation_rows], y[validation_rows])
+        predictions = {}
+        td_predictions = {}
+        if self.backend.multi_head:
+            # the variants are heads of one model, trained in a single pass and exported one by one
+            heads = self.backend.create_heads(features_count)
+            self.backend.fit(heads, X[train_rows], y[train_rows], validation=validation)
+            models = {model_name: self.backend.export_head(heads, model_name) for model_name in self.backend.algorithms}
+            predictions = self.backend.predict_heads(heads, X)
+            if testing_data is not None:
+                td_predictions = self.backend.predict_heads(heads, X_td)
+        else:
+            models = {model_name: self.backend.create(model_name, { 'features': features_count }) for model_name in self.backend.algorithms}
+            for model_name, model in models.items():
+                ## fit with training data, early stopping watches the validation rows
+                self.backend.fit(model, X[train_rows], y[train_rows], validation=validation)
+                # one batched predict per dataset, every metric is computed from it
+                predictions[model_name] = self.backend.predict(model, X)
+                if testing_data is not None:
+                    td_predictions[model_name] = self.backend.predict(model, X_td)
 
-        # Train, test, and evaluate each model
+        # Test and evaluate each model
         results = {}
         scores = []
         for model_name, model in models.items():
-            ## fit with training data
-            model.fit(X_train, y_train, epochs=10, batch_size=32)
-
-            score = self._score(model, features, target, model_name, 1)
-            score['tf_mse'] = model.evaluate(X_test, y_test)
+            y_pred = predictions[model_name]
+            score = self._score_predictions(y, y_pred, model_name, 1)
+            score['tf_mse'] = float(np.mean((y[test_rows] - y_pred[test_rows])**2))
             scores.append(score)
 
             if testing_data is not None:
                 # test the model against the testing data provided and score the results
-                td, _ = self.rules.apply(pd.DataFrame(testing_data), self.target_label)
-                score = self._score(model, td[self.feature_cols], td[self.target_label], model_name, 2)
-                score['tf_mse'] = model.evaluate(td[self.feature_cols], td[self.target_label])
+                y_pred = td_predictions[model_name]
+                score = self._score_predictions(y_td, y_pred, model_name, 2)
+                score['tf_mse'] = float(np.mean((y_td - y_pred)**2))
                 scores.append(score)
 
             results[model_name] = score
 
         best_model_name = min(results, key=lambda model_name: (results[model_name]['tf_mse'], results[model_name]['mae']))
         best_model = models[best_model_name]
+        self.best_model_name = best_model_name
+
+        return best_model, { 'metadata': self.metadata, 'scores': scores, 'results': results, 'preprocessing': dict(self.preprocessing_stats) }
 
-        return best_model, { 'metadata': self.metadata, 'scores': scores, 'results': results }
 
+    def _score(self, model, X, y, algorithm_name, iteration, lag=1):
+        y_pred = self.model_engines.get(algorithm_name, self.backend).predict(model, X)
+        return self._score_predictions(y, y_pred, algorithm_name, iteration, lag)
 
-    def _score(self, model, X, y, algorithm_name, iteration):
-        y_pred = model.predict(X)
-        score = {
+    def _score_predictions(self, y, y_pred, algorithm_name, iteration, lag=1):
+        return {
             'iteration': iteration,
             'algorithm': algorithm_name,
-            'mse': mean_squared_error(y[1:], y_pred[:-1]),
-            'mae': mean_absolute_error(y[1:], y_pred[:-1]),
-            'r2': r2_score(y[1:], y_pred[:-1]),
+            **self.scorer.score(y, y_pred, lag),
         }
-        return score
\ No newline at end of file
+
+
+class ModelSearch:
+    """
+    Grid or random search over trainer parameters. The search space maps dotted parameter paths
+    to lists of values, e.g. { 'hyper.random_forest.n_estimators': [100, 300] }. The datasets are
+    preprocessed once and every trial trains on the shared frames.
+    """
+
+    def __init__(self, parameters, search):
+        self.parameters = parameters
+        self.search_type = search.get('type', 'grid')
+        self.space = search.get('space', {})
+        self.n_iter = search.get('n_iter', 10)
+        self.random_state = search.get('random_state', None)
+        self.cpu_budget = int(parameters.get('cpu_budget', os.environ.get('LRNSTAK_CPU_BUDGET', os.cpu_count() or 1)))
+        self.max_workers = search.get('workers', None)
+
+        if self.search_type not in ['grid', 'random']:
+            raise ValueError(f"Unsupported search type: {self.search_type}")
+        for path, values in self.space.items():
+            # the preprocessing is shared, so nothing it depends on can vary between trials
+            if path.split('.')[0] in ['rules', 'target_label']:
+                raise ValueError(f"Search space can not vary preprocessing parameter: {path}")
+            if not isinstance(values, list) or len(values) == 0:
+                raise ValueError(f"Search space values must be a non-empty list: {path}")
+        # invalid trainer parameters are rejected before any trial runs
+        ModelTrainer(copy.deepcopy(parameters))
+
+    def trials(self):
+        from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+        if self.search_type == 'random':
+            points = list(ParameterSampler(self.space, n_iter=self.n_iter, random_state=self.random_state))
+        else:
+            points = list(ParameterGrid(self.space))
+
+        trials = []
+        for point in points:
+            parameters = copy.deepcopy(self.parameters)
+            for path, value in point.items():
+                keys = path.split('.')
+                target = parameters
+                for key in keys[:-1]:
+                    target = target.setdefault(key, {})
+                target[keys[-1]] = value
+            trials.append((point, parameters))
+        return trials
+
+    def run(self, input_data, testing_data = None):
+        """
+        Train every trial, returns the best model, the parameters of its trial and its training
+        results extended with the scores of every trial under 'search'.
+        """
+        trials = self.trials()
+
+        # preprocess up front, the trial trainers share the cached frames
+        shared = ModelTrainer(copy.deepcopy(self.parameters))
+        shared.preprocess(input_data)
+        if testing_data is not None:
+            shared.preprocess(testing_data)
+
+        workers = max(1, min(len(trials), self.max_workers or self.cpu_budget, self.cpu_budget))
+        trainers = []
+        for point, parameters in trials:
+            parameters['cpu_budget'] = max(1, self.cpu_budget // workers)
+            trainer = ModelTrainer(parameters)
+            trainer.preprocessed = shared.preprocessed
+            trainers.append(trainer)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(lambda trainer: trainer.train(input_data, testing_data), trainers))
+
+        search = { 'type': self.search_type, 'space': self.space, 'trials': [] }
+        best = None
+        for i, ((point, parameters), (model, results)) in enumerate(zip(trials, outcomes)):
+            ranking = min((score.get('tf_mse', score['mse']), score['mae']) for score in results['results'].values())
+            search['trials'].append({ 'trial': i, 'parameters': point, 'results': results['results'] })
+            if best is None or ranking < best[0]:
+                best = (ranking, i)
+
+        best_trial = best[1]
+        self.best_trainer = trainers[best_trial]
+        search['best_trial'] = best_trial
+        preprocessing = dict(shared.preprocessing_stats)
+        for trainer in trainers:
+            preprocessing['hits'] += trainer.preprocessing_stats['hits']
+            preprocessing['seconds_saved'] += trainer.preprocessing_stats['seconds_saved']
+
+        model, results = outcomes[best_trial]
+        results = { **results, 'search': search, 'preprocessing': preprocessing }
+        return model, trials[best_trial][1], results
+
+    def serialize(self, model, path):
+        self.best_trainer.serialize(model, path)
@@ -25,12 +25,30 @@ def predict_next_value(symbol, target, model_version, data):
     response = requests.post(predict_url, json=payload)
     if response.status_code == 200:
         predictions = response.json()
-        if isinstance(predictions, dict):
+        if 'error' in predictions:
             raise Exception(f'{predictions}')
-        return predictions
+        return predictions['prediction']
 #     print(f'ERROR POST {predict_url} version={model_version} {response} {len(payload["data"])} {json.dumps(payload["data"][-1], indent=2)}')
     raise Exception(f'ERROR {response.status_code} {response.text}')
 
+def forecast(symbol, model_version, period, quotes, target_features, steps):
+    # the server runs the recursive predictions of every target model and returns the forecast rows
+    forecast_url = f"http://ibconnect.cyberdyne:5000/predict/model/{symbol}_{target_features[0]}/forecast?steps={steps}"
+    print(f'Forecasting {steps} steps for {symbol} version {model_version}')
+    payload = {
+        'version': f"{model_version}",
+        'data': quotes,
+        'models': {feature: f'{symbol}_{feature}' for feature in target_features[1:]},
+        'timestamp': {'column': 'last_timestamp', 'period': period},
+    }
+    response = requests.post(forecast_url, json=payload)
+    if response.status_code == 200:
+        forecast = response.json()
+        if 'error' in forecast:
+            raise Exception(f'{forecast}')
+        return forecast['rows']
+    raise Exception(f'ERROR {response.status_code} {response.text}')
+
 def next_timestamp(timestamp, period):
     timestamp_format = "%Y-%m-%dT%H:%M:%SZ"
     dt = datetime.strptime(timestamp, timestamp_format)
@@ -69,7 +87,7 @@ def run_predictions(symbol, model_version, period, quotes, target_features = ['l
 #         next_entry = {**real_data, **{f'{feature}': data['prediction'] for feature, data in zip(target_features, prediction_data)}}
         #print(json.dumps(real_data, indent=2))
         #print(json.dumps(prediction_data, indent=2))
-        next_entry = {**real_data, **{f'next_{feature.replace("last_", "")}': data['prediction'] for feature, data in zip(target_features, prediction_data)}}
+        next_entry = {**real_data, **{f'next_{feature.replace("last_", "")}': value for feature, value in zip(target_features, prediction_data)}}
         next_data.append(next_entry)
         previous = next_entry
 
@@ -101,9 +119,7 @@ if __name__ == "__main__":
 #         print(next[-1])
         NamespacedCache('predicted').put(f'{symbol}', { symbol: next })
 
-        for _ in range(30):
-            next = run_predictions(symbol, model_version, period, next, features)
-            quotes.append(next[-1])
+        quotes.extend(forecast(symbol, f'{model_version}_{period}', period, quotes, features, 30))
 
         #  4. predict the next set of values, append the prediction and run prediction model again
         #make_model(symbol, model_version, 'last_close', ['last_open', 'last_volume', 'last_trades', 'percentile_close', 'percentile_high', 'percentile_low'])
@@ -15,9 +15,9 @@ def predict_next_value(symbol, target, model_version, data):
     response = requests.post(predict_url, json=payload)
     if response.status_code == 200:
         predictions = response.json()
-        if isinstance(predictions, dict):
+        if 'error' in predictions:
             raise Exception(f'{predictions}')
-        return predictions
+        return predictions['prediction']
     raise Exception(f'ERROR {response.status_code} {response.text}')
 
 def run_predictions(symbol, model_version, quotes, target_features = ['close']):
@@ -31,7 +31,7 @@ def run_predictions(symbol, model_version, quotes, target_features = ['close']):
     next_data = []
 
     for real_data, *prediction_data in zip(quotes, *predictions.values()):
-        next_entry = {**real_data, **{f'next_{feature}': data['prediction'] for feature, data in zip(target_features, prediction_data)}}
+        next_entry = {**real_data, **{f'next_{feature}': value for feature, value in zip(target_features, prediction_data)}}
         next_data.append(next_entry)
 
     return next_data
@@ -52,7 +52,7 @@ def predict_next_value(symbol, target, model_version, data):
     response = requests.post(predict_url, json={'version': f"{model_version}", 'data': data})
     if response.status_code == 200:
         predictions = response.json()
-        return predictions
+        return predictions['prediction']
     raise Exception(f'ERROR {response.status_code} POST {predict_url} [data]')
 
 if __name__ == "__main__":
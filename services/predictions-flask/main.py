@@ -3,8 +3,9 @@ import logging
 import time
 from datetime import datetime
 from flask import Flask, request, jsonify
-from lrnstak.predictions_module import Model
+from lrnstak.predictions_module import Model, dumps
 from lrnstak.registry_client import CachingRegistry
+from lrnstak.prediction_session import SessionStore, forecast
 
 app = Flask(__name__)
 
@@ -40,21 +41,30 @@ def health_check():
 
 MODEL_REGISTRY_URL = 'http://registry:5000/models'
 registry = CachingRegistry(MODEL_REGISTRY_URL)
+sessions = SessionStore(ttl=600, max_sessions=1000, max_rows=10000)
 
 @app.route('/predict/model/<string:model_name>', methods=['POST'])
 def predict_model(model_name):
     try:
         data = request.json['data']
         version = request.json.get('version', 'latest')
+        # columnar output by default, format=rows returns the previous one dict per row output
+        format = request.json.get('format', 'columns')
+        columns = request.json.get('columns', [])
 
-        model, parameters, status = registry.get_and_cache(model_name, version)
+        model, parameters, rules, status = registry.get_pipeline(model_name, version)
 
         if status == 200:
             try:
                 app.logger.info(f"Prediction Running for {model_name}/{version}")
                 app.logger.info(f"Parameters: {parameters}")
-                prediction = Model().evaluate(model, data, parameters)
-                return jsonify(prediction)
+                prediction = Model().evaluate(model, data, parameters, format=format, columns=columns, rules=rules)
+                if format == 'rows':
+                    return jsonify(prediction)
+                return app.response_class(dumps(prediction), mimetype='application/json')
+            except ValueError as e:
+                # e.g. unknown echo columns
+                return jsonify({'error': str(e)}), 400
             except Exception as e:
                 app.logger.exception("EVAL ERROR", str(e))
                 return jsonify({'error': str(e)}), 500
@@ -65,6 +75,122 @@ def predict_model(model_name):
         app.logger.exception("ERROR", str(e))
         return jsonify({'error': str(e)}), 500
 
+@app.route('/predict/model/<string:model_name>/forecast', methods=['POST'])
+def forecast_model(model_name):
+    """
+    Recursive forecast of `steps` periods, e.g. ?steps=30 with { data: [], version: 'v1', models: { last_open: 'AAPL_last_open' },
+    timestamp: { column: 'last_timestamp', period: 'day' } }. The model predicts its target column, `models` adds the related
+    target models, every step's predictions are fed back as the next row.
+    """
+    try:
+        steps = request.args.get('steps', 1, type=int)
+        if steps < 1:
+            return jsonify({'error': 'steps must be at least 1'}), 400
+        data = request.json['data']
+        version = request.json.get('version', 'latest')
+        timestamp = request.json.get('timestamp')
+
+        model, parameters, rules, status = registry.get_pipeline(model_name, version)
+        if status != 200:
+            return jsonify({'error': f'registry failure for {model_name}/{version}'}), status
+        pipelines = { Model()._target_label(parameters): (model, parameters, rules) }
+
+        for column, related in request.json.get('models', {}).items():
+            model, parameters, rules, status = registry.get_pipeline(related, version)
+            if status != 200:
+                return jsonify({'error': f'registry failure for {related}/{version}'}), status
+            pipelines[column] = (model, parameters, rules)
+
+        app.logger.info(f"Forecast of {steps} steps for {model_name}/{version} over {list(pipelines)}")
+        return app.response_class(dumps(forecast(pipelines, data, steps, timestamp=timestamp)), mimetype='application/json')
+
+    except ValueError as e:
+        # e.g. an unknown period or timestamp column
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.exception("ERROR", str(e))
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Predict one dataset with several models, e.g. { data: [], models: [{ model: 'AAPL_close', version: 'v1' }, ...] }.
+    The data is parsed and preprocessed once per distinct rule pipeline, the models run concurrently.
+    """
+    try:
+        data = request.json['data']
+        requested = request.json['models']
+        format = request.json.get('format', 'columns')
+        columns = request.json.get('columns', [])
+
+        pipelines = []
+        for entry in requested:
+            version = entry.get('version', 'latest')
+            model, parameters, rules, status = registry.get_pipeline(entry['model'], version)
+            if status != 200:
+                return jsonify({'error': f"registry failure for {entry['model']}/{version}"}), status
+            pipelines.append((model, parameters, rules))
+
+        app.logger.info(f"Batch prediction for {len(pipelines)} models")
+        results = Model().evaluate_batch(pipelines, data, format=format, columns=columns)
+
+        predictions = []
+        for entry, result in zip(requested, results):
+            found = { 'model': entry['model'], 'version': entry.get('version', 'latest') }
+            predictions.append({ **found, **result } if format == 'columns' else { **found, 'rows': result })
+        return app.response_class(dumps({ 'predictions': predictions }), mimetype='application/json')
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.exception("ERROR", str(e))
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict/session', methods=['POST'])
+def open_session():
+    """
+    Open a prediction session for a model version, rows appended to it are predicted incrementally.
+    """
+    try:
+        model_name = request.json['model']
+        version = request.json.get('version', 'latest')
+
+        model, parameters, rules, status = registry.get_pipeline(model_name, version)
+        if status != 200:
+            return jsonify({'error': 'registry failure'}), status
+
+        session_id = sessions.open(model, parameters, rules)
+        app.logger.info(f"Session {session_id} opened for {model_name}/{version}")
+        return jsonify({'session': session_id, 'ttl': sessions.ttl})
+
+    except Exception as e:
+        app.logger.exception("ERROR", str(e))
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict/session/<string:session_id>', methods=['POST'])
+def append_session(session_id):
+    try:
+        session = sessions.get(session_id)
+        if session is None:
+            return jsonify({'error': f'Session {session_id} not found or expired.'}), 404
+
+        data = request.json['data']
+        columns = request.json.get('columns', [])
+        prediction = session.append(data, columns)
+        return app.response_class(dumps(prediction), mimetype='application/json')
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.exception("ERROR", str(e))
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict/session/<string:session_id>', methods=['DELETE'])
+def close_session(session_id):
+    if sessions.close(session_id):
+        return jsonify({'message': f'Session {session_id} closed.'})
+    return jsonify({'error': f'Session {session_id} not found or expired.'}), 404
+
 @app.route('/predict/<string:target_label>', methods=['POST'])
 def predict(target_label):
     try:
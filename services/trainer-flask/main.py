@@ -4,13 +4,13 @@ import sys
 import logging
 import base64
 import json
-import joblib
 import requests
 import tempfile
 import time
 from datetime import datetime
 from flask import Flask, request, jsonify
-from lrnstak.training_module import ModelTrainer
+from lrnstak.training_module import ModelTrainer, ModelSearch
+from lrnstak.registry_client import Registry
 
 
 app = Flask(__name__)
@@ -46,30 +46,13 @@ def health_check():
 MODEL_REGISTRY_URL = 'http://registry:5000/models'
 #MODEL_REGISTRY_URL = 'http://10.6.88.8:5201/models'
 
-@app.route('/train/<string:model_name>', methods=['POST'])
-def train_and_save_model(model_name):
+def register_model(model_name, version, trainer, trained_model, parameters, results, training_data):
+    """
+    Serialize a trained model with its engine's hook and POST it to the model registry, returns the flask response.
+    """
     tmp = tempfile.NamedTemporaryFile().name
     try:
-        version = request.json['version']
-        parameters = request.json.get('parameters', None)
-        training_data = request.json.get('training_data', None)
-        testing_data = request.json.get('testing_data', None)
-        validation_data = request.json.get('validation_data', None)
-
-        if parameters is None:
-            return jsonify({'message': f'parameters key is required.'}), 400
-
-        if training_data is None:
-            return jsonify({'message': f'training_data key is required.'}), 400
-
-        app.logger.info(f"Training {model_name}/{version} {json.dumps(parameters, indent=2)}")
-
-        model_trainer = ModelTrainer(parameters)
-
-        # app.logger.info(f"Training Data {json.dumps(training_data, indent=2)} ==")
-        trained_model, results = model_trainer.train(training_data, testing_data)
-
-        joblib.dump(trained_model, tmp)
+        trainer.serialize(trained_model, tmp)
 
         with open(tmp, 'rb') as file:
             model_bytes = file.read()
@@ -91,19 +74,105 @@ def train_and_save_model(model_name):
             app.logger.error(response.text)
             app.logger.error(f'Failed to save the model. Status code: {response.status_code}')
             return jsonify({'error': f'Failed to save the model. Status code: {response.status_code}'}), response.status_code
+    finally:
+        try:
+            os.remove(tmp)
+        except:
+            ## do nothing
+            pass
+
+def previous_version(model_name, version):
+    """
+    The registered model, parameters and training data of a version, for incremental training.
+    """
+    registry = Registry(MODEL_REGISTRY_URL)
+    model, parameters, status_code = registry.get(model_name, version)
+    if status_code != 200:
+        raise Exception(f'Failed to load {model_name}_{version} from the registry. Status code: {status_code}')
+    training_data, _, status_code = registry.get_training_data(model_name, version)
+    if status_code != 200:
+        raise Exception(f'Failed to load the training data of {model_name}_{version}. Status code: {status_code}')
+    return { 'model': model, 'parameters': parameters, 'training_data': training_data }
+
+@app.route('/train/<string:model_name>', methods=['POST'])
+def train_and_save_model(model_name):
+    try:
+        version = request.json['version']
+        parameters = request.json.get('parameters', None)
+        training_data = request.json.get('training_data', None)
+        testing_data = request.json.get('testing_data', None)
+        validation_data = request.json.get('validation_data', None)
+
+        if parameters is None:
+            return jsonify({'message': f'parameters key is required.'}), 400
+
+        if training_data is None:
+            return jsonify({'message': f'training_data key is required.'}), 400
+
+        app.logger.info(f"Training {model_name}/{version} {json.dumps(parameters, indent=2)}")
+
+        try:
+            model_trainer = ModelTrainer(parameters)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+
+        # app.logger.info(f"Training Data {json.dumps(training_data, indent=2)} ==")
+        incremental = parameters.get('incremental', None)
+        if incremental is not None:
+            # continue training the previous version on the new rows only
+            previous = previous_version(model_name, incremental['from_version'])
+            trained_model, results = model_trainer.train_incremental(previous, training_data, testing_data)
+            app.logger.info(f"Incremental training of {model_name}/{version}: {json.dumps(results['incremental'])}")
+        else:
+            trained_model, results = model_trainer.train(training_data, testing_data)
+
+        return register_model(model_name, version, model_trainer, trained_model, parameters, results, training_data)
 
     except Exception as e:
         traceback.print_exc()
         app.logger.error(str(e))
         app.logger.error(f'Failed to save the model.')
         return jsonify({'error': str(e)}), 500
-    finally:
+
+@app.route('/train/<string:model_name>/search', methods=['POST'])
+def search_and_save_model(model_name):
+    """
+    Grid or random search over the training parameters. The data is uploaded and preprocessed
+    once, the trials train concurrently and the best one is registered with every trial's scores.
+    """
+    try:
+        version = request.json['version']
+        parameters = request.json.get('parameters', None)
+        search = request.json.get('search', None)
+        training_data = request.json.get('training_data', None)
+        testing_data = request.json.get('testing_data', None)
+
+        if parameters is None:
+            return jsonify({'message': f'parameters key is required.'}), 400
+
+        if search is None:
+            return jsonify({'message': f'search key is required.'}), 400
+
+        if training_data is None:
+            return jsonify({'message': f'training_data key is required.'}), 400
+
+        app.logger.info(f"Searching {model_name}/{version} {json.dumps(search, indent=2)}")
+
         try:
-            os.remove(tmp)
-        except:
-            ## do nothing
-            pass
+            model_search = ModelSearch(parameters, search)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+
+        trained_model, best_parameters, results = model_search.run(training_data, testing_data)
+
+        app.logger.info(f"Best trial {results['search']['best_trial']} of {len(results['search']['trials'])} for {model_name}/{version}")
+        return register_model(model_name, version, model_search, trained_model, best_parameters, results, training_data)
 
+    except Exception as e:
+        traceback.print_exc()
+        app.logger.error(str(e))
+        app.logger.error(f'Failed to save the model.')
+        return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
     print("start")
@@ -15,6 +15,7 @@ setup(
         'keras',
         'pandas',
         'requests',
+        'orjson',
     ],
     classifiers=[
         'Programming Language :: Python :: 3',
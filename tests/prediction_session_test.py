@@ -0,0 +1,183 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from lrnstak.predictions_module import Model
+from lrnstak.prediction_session import PredictionSession, SessionStore, forecast
+from lrnstak.processor_rules import Rules
+
+@pytest.fixture
+def sample_data():
+    rng = np.random.default_rng(0)
+    return [{ 'open': float(rng.normal()), 'close': float(rng.normal()), 'history': list(rng.normal(size=3)), 'day': i } for i in range(12)]
+
+@pytest.fixture
+def parameters():
+    return { 'target_label': 'close', 'feature_labels': ['open', 'sum_history'], 'rules': { 'flatten': { 'history': ['sum'] } } }
+
+@pytest.fixture
+def model(sample_data, parameters):
+    df, feature_cols, target_label = Model()._data_features_target(sample_data, parameters)
+    return LinearRegression().fit(df[feature_cols], df[target_label])
+
+def test_append_predicts_new_rows(model, sample_data, parameters):
+    session = PredictionSession(model, parameters, Rules(parameters['rules']))
+    expected = Model().evaluate(model, sample_data, parameters, format='columns', columns=['day'])
+
+    first = session.append(sample_data[:10], ['day'])
+    assert first['computed'] == 10
+
+    # Re-sending the window with one new row only computes the new row
+    second = session.append(sample_data[:11], ['day'])
+    assert second['computed'] == 1
+    assert np.allclose(second['prediction'], expected['prediction'][:11])
+    assert second['columns']['day'] == list(range(11))
+
+    third = session.append(sample_data[11:], ['day'])
+    assert third['computed'] == 1
+    assert np.allclose(third['prediction'], expected['prediction'][11:])
+
+def test_append_echoes_rule_outputs(model, sample_data, parameters):
+    parameters = { **parameters, 'rules': { **parameters['rules'], 'extract': { 'day': { 'type': 'numeric' } } } }
+    session = PredictionSession(model, parameters, Rules(parameters['rules']))
+
+    # day_numeric is no feature of the model, it is still computed when echoed
+    result = session.append(sample_data, ['day_numeric'])
+    assert result['columns']['day_numeric'] == [float(day) for day in range(12)]
+
+def test_append_bounded_cache(model, sample_data, parameters):
+    session = PredictionSession(model, parameters, Rules(parameters['rules']), max_rows=5)
+    session.append(sample_data)
+
+    # Only the most recently used rows are kept
+    assert len(session.cache) == 5
+    assert session.append(sample_data[-5:])['computed'] == 0
+    assert session.append(sample_data[:1])['computed'] == 1
+
+def test_append_pivot_recomputes_window(sample_data):
+    # pivot column i holds the values of row i, long enough rows fill every column
+    rng = np.random.default_rng(1)
+    sample_data = [{ **row, 'history': list(rng.normal(size=12)) } for row in sample_data]
+    parameters = { 'target_label': 'close', 'feature_labels': ['open', 'history_0'], 'rules': { 'expand': { 'history': 'pivot' } } }
+    df, feature_cols, target_label = Model()._data_features_target(sample_data, parameters)
+    model = LinearRegression().fit(df[feature_cols], df[target_label])
+    session = PredictionSession(model, parameters, Rules(parameters['rules']))
+
+    # Pivot columns depend on every row, the window is preprocessed again on each append
+    assert not session.row_local
+    session.append(sample_data[:6])
+    result = session.append(sample_data[6:])
+    assert result['computed'] == 12
+    expected = Model().evaluate(model, sample_data, parameters, format='columns')
+    assert np.allclose(result['prediction'], expected['prediction'][6:])
+
+def test_append_pivot_overlapping_windows(sample_data):
+    rng = np.random.default_rng(1)
+    sample_data = [{ **row, 'history': list(rng.normal(size=12)) } for row in sample_data]
+    parameters = { 'target_label': 'close', 'feature_labels': ['open', 'history_0'], 'rules': { 'expand': { 'history': 'pivot' } } }
+    df, feature_cols, target_label = Model()._data_features_target(sample_data, parameters)
+    model = LinearRegression().fit(df[feature_cols], df[target_label])
+    session = PredictionSession(model, parameters, Rules(parameters['rules']))
+
+    # Rows posted again are not added to the window twice
+    session.append(sample_data[:8])
+    result = session.append(sample_data[4:])
+    assert len(session.window) == 12
+    expected = Model().evaluate(model, sample_data, parameters, format='columns')
+    assert np.allclose(result['prediction'], expected['prediction'][4:])
+
+    result = session.append(sample_data)
+    assert len(session.window) == 12
+    assert np.allclose(result['prediction'], expected['prediction'])
+
+def test_cache_keeps_echo_columns_only(model, sample_data, parameters):
+    session = PredictionSession(model, parameters, Rules(parameters['rules']))
+    session.append(sample_data)
+
+    # Neither the raw history nor the rule outputs are kept
+    assert all(echo == {} for _, echo in session.cache.values())
+
+    # Rows seen without a requested echo column are computed again
+    result = session.append(sample_data, ['day', 'sum_history'])
+    assert result['computed'] == 12
+    assert result['columns']['day'] == list(range(12))
+    assert set(next(iter(session.cache.values()))[1]) == { 'day', 'sum_history' }
+    assert session.append(sample_data, ['day'])['computed'] == 0
+
+    with pytest.raises(ValueError):
+        session.append(sample_data[:1] + [{ **sample_data[0], 'day': 99 }], ['unknown'])
+
+def test_forecast_feeds_predictions_back(model, sample_data, parameters):
+    related = { 'target_label': 'open', 'feature_labels': ['close', 'sum_history'], 'rules': parameters['rules'] }
+    df, feature_cols, target_label = Model()._data_features_target(sample_data, related)
+    open_model = LinearRegression().fit(df[feature_cols], df[target_label])
+    sample_data = [{ **row, 'timestamp': f'2023-11-{i + 1:02d}T00:00:00Z' } for i, row in enumerate(sample_data)]
+    pipelines = { 'close': (model, parameters, Rules(parameters['rules'])), 'open': (open_model, related, Rules(related['rules'])) }
+
+    result = forecast(pipelines, sample_data, 3, timestamp={ 'column': 'timestamp', 'period': 'day' })
+
+    # Every step predicts the last row with both models and appends it with the predictions
+    window = list(sample_data)
+    for step in range(3):
+        close = Model().evaluate(model, window[-1:], parameters, format='columns')['prediction'][0]
+        open = Model().evaluate(open_model, window[-1:], related, format='columns')['prediction'][0]
+        assert result['forecast']['close'][step] == pytest.approx(close)
+        assert result['forecast']['open'][step] == pytest.approx(open)
+        window.append({ **window[-1], 'close': close, 'open': open })
+    assert [row['timestamp'] for row in result['rows']] == ['2023-11-13T00:00:00Z', '2023-11-14T00:00:00Z', '2023-11-15T00:00:00Z']
+    assert result['rows'][-1]['history'] == sample_data[-1]['history']
+
+def test_forecast_pivot_rules(sample_data):
+    rng = np.random.default_rng(1)
+    # long enough to fill the pivot of the window and the forecast rows
+    sample_data = [{ **row, 'history': list(rng.normal(size=15)) } for row in sample_data]
+    parameters = { 'target_label': 'close', 'feature_labels': ['open', 'history_0'], 'rules': { 'expand': { 'history': 'pivot' } } }
+    df, feature_cols, target_label = Model()._data_features_target(sample_data, parameters)
+    model = LinearRegression().fit(df[feature_cols], df[target_label])
+
+    result = forecast({ 'close': (model, parameters, Rules(parameters['rules'])) }, sample_data, 3)
+
+    # Rules that are not row-local predict every step like a stateless evaluate of the whole window
+    window = list(sample_data)
+    for step in range(3):
+        close = Model().evaluate(model, window, parameters, format='columns')['prediction'][-1]
+        assert result['forecast']['close'][step] == pytest.approx(close)
+        window.append({ **window[-1], 'close': close })
+
+def test_forecast_timestamp_formats(model, sample_data, parameters):
+    pipelines = { 'close': (model, parameters, Rules(parameters['rules'])) }
+
+    # The advanced timestamp keeps the format of the input
+    for value, expected in [('2023-11-01T07:00:00Z', '2023-11-02T07:00:00Z'), ('2023-11-01T07:00:00+02:00', '2023-11-02T07:00:00+02:00'),
+                            ('2023-11-01 07:00:00', '2023-11-02 07:00:00'), ('2023-11-01', '2023-11-02'), (1698822000, 1698908400)]:
+        rows = [{ **row, 'timestamp': value } for row in sample_data]
+        result = forecast(pipelines, rows, 1, timestamp={ 'column': 'timestamp', 'period': 'day' })
+        assert result['rows'][0]['timestamp'] == expected
+
+def test_forecast_unknown_period(model, sample_data, parameters):
+    pipelines = { 'close': (model, parameters, Rules(parameters['rules'])) }
+    with pytest.raises(ValueError):
+        forecast(pipelines, sample_data, 2, timestamp={ 'column': 'day', 'period': 'fortnight' })
+    with pytest.raises(ValueError):
+        forecast(pipelines, sample_data, 2, timestamp={ 'column': 'unknown', 'period': 'day' })
+
+def test_session_store_expiry(model, parameters, monkeypatch):
+    store = SessionStore(ttl=10, max_sessions=2)
+    now = [1000.0]
+    monkeypatch.setattr('lrnstak.prediction_session.time.time', lambda: now[0])
+
+    first = store.open(model, parameters, Rules(parameters['rules']))
+    assert store.get(first) is not None
+
+    # Sessions expire ttl seconds after their last use
+    now[0] += 11
+    assert store.get(first) is None
+
+    # The least recently used session is closed beyond max_sessions
+    sessions = [store.open(model, parameters, Rules(parameters['rules'])) for _ in range(3)]
+    assert store.get(sessions[0]) is None
+    assert store.close(sessions[2])
+    assert not store.close(sessions[2])
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
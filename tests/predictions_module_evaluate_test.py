@@ -0,0 +1,132 @@
+import json
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from lrnstak import predictions_module
+from lrnstak.predictions_module import Model, dumps
+from lrnstak.processor_rules import Rules
+
+@pytest.fixture
+def sample_data():
+    rng = np.random.default_rng(0)
+    return [{ 'open': float(rng.normal()), 'close': float(rng.normal()), 'history': list(rng.normal(size=3)), 'timestamp': f'2023-11-{i + 1:02d}T07:00:00Z' } for i in range(10)]
+
+@pytest.fixture
+def parameters():
+    return { 'target_label': 'close', 'feature_labels': ['open', 'sum_history'], 'rules': { 'flatten': { 'history': ['sum'] } } }
+
+@pytest.fixture
+def model(sample_data, parameters):
+    df, feature_cols, target_label = Model()._data_features_target(sample_data, parameters)
+    return LinearRegression().fit(df[feature_cols], df[target_label])
+
+def test_evaluate_columns(model, sample_data, parameters):
+    rows = Model().evaluate(model, sample_data, parameters)
+    columns = Model().evaluate(model, sample_data, parameters, format='columns', columns=['timestamp', 'sum_history'])
+
+    # The columnar output holds the same predictions and echo values as the rows
+    assert np.allclose(columns['prediction'], [row['prediction'] for row in rows])
+    assert columns['columns']['timestamp'] == [row['timestamp'] for row in rows]
+    assert np.allclose(columns['columns']['sum_history'], [row['sum_history'] for row in rows])
+
+    # Only the requested columns are echoed
+    assert list(columns['columns']) == ['timestamp', 'sum_history']
+
+def test_evaluate_unknown_columns(model, sample_data, parameters):
+    with pytest.raises(ValueError):
+        Model().evaluate(model, sample_data, parameters, format='columns', columns=['unknown'])
+
+def test_evaluate_echoes_rule_outputs(model, sample_data, parameters):
+    # a rule output no feature uses, like the datetime elements of the timestamp
+    parameters = { **parameters, 'rules': { **parameters['rules'], 'extract': { 'timestamp': { 'type': 'datetime', 'elements': ['day'] } } } }
+
+    rows = Model().evaluate(model, sample_data, parameters)
+    assert [row['timestamp_day'] for row in rows] == list(range(1, 11))
+
+    columns = Model().evaluate(model, sample_data, parameters, format='columns', columns=['timestamp_day'])
+    assert list(columns['columns']['timestamp_day']) == list(range(1, 11))
+
+    batch = Model().evaluate_batch([(model, parameters, None)], sample_data, columns=['timestamp_day'])
+    assert list(batch[0]['columns']['timestamp_day']) == list(range(1, 11))
+    batch = Model().evaluate_batch([(model, parameters, None)], sample_data, format='rows')
+    assert [row['timestamp_day'] for row in batch[0]] == list(range(1, 11))
+
+def test_dumps(model, sample_data, parameters, monkeypatch):
+    columns = Model().evaluate(model, sample_data, parameters, format='columns', columns=['timestamp', 'sum_history'])
+    expected = { 'prediction': columns['prediction'].tolist(), 'columns': { 'timestamp': columns['columns']['timestamp'], 'sum_history': columns['columns']['sum_history'].tolist() } }
+
+    # orjson (when installed) and the json fallback produce the same document
+    assert json.loads(dumps(columns)) == expected
+    monkeypatch.setattr(predictions_module, 'orjson', None)
+    assert json.loads(dumps(columns)) == expected
+
+    # Finite responses are serialized without the null replacement walk
+    monkeypatch.setattr(predictions_module, '_finite', None)
+    assert json.loads(dumps(columns)) == expected
+
+def test_dumps_nan_and_timestamps(monkeypatch):
+    import pandas as pd
+    response = { 'prediction': np.array([1.5, np.nan, np.inf]), 'columns': { 'timestamp': [pd.Timestamp('2023-11-01T07:00:00')], 'value': [np.float64('nan')] } }
+    expected = { 'prediction': [1.5, None, None], 'columns': { 'timestamp': ['2023-11-01T07:00:00'], 'value': [None] } }
+
+    # Both serializers write valid JSON with null for NaN
+    assert json.loads(dumps(response)) == expected
+    monkeypatch.setattr(predictions_module, 'orjson', None)
+    assert json.loads(dumps(response)) == expected
+
+def test_evaluate_batch(model, sample_data, parameters, monkeypatch):
+    other = { **parameters, 'feature_labels': ['open'] }
+    other_model = LinearRegression().fit(Model()._data_features_target(sample_data, other)[0][['open']], [row['close'] for row in sample_data])
+
+    # Models with the same rules and target share one preprocessing pass
+    applied = []
+    apply = Rules.apply
+    monkeypatch.setattr(Rules, 'apply', lambda self, *args, **kwargs: applied.append(kwargs.get('features')) or apply(self, *args, **kwargs))
+    results = Model().evaluate_batch([(model, parameters, None), (other_model, other, None)], sample_data, columns=['timestamp'])
+    assert applied == [['open', 'sum_history', 'close', 'timestamp']]
+
+    # Every model gets the same result as a single evaluation
+    for result, (expected_model, expected_parameters) in zip(results, [(model, parameters), (other_model, other)]):
+        expected = Model().evaluate(expected_model, sample_data, expected_parameters, format='columns', columns=['timestamp'])
+        assert np.array_equal(result['prediction'], expected['prediction'])
+        assert result['columns'] == expected['columns']
+
+def test_evaluate_batch_different_targets(sample_data, parameters, monkeypatch):
+    # one model per target with the same rules, like the sample clients' last_close, last_open, ...
+    targets = { 'close': ['open', 'sum_history'], 'open': ['close', 'sum_history'], 'sum_history': ['open', 'close'] }
+    pipelines = []
+    for target, features in targets.items():
+        target_parameters = { **parameters, 'target_label': target, 'feature_labels': features }
+        df, feature_cols, target_label = Model()._data_features_target(sample_data, target_parameters)
+        pipelines.append((LinearRegression().fit(df[feature_cols], df[target_label]), target_parameters, None))
+
+    applied = []
+    apply = Rules.apply
+    monkeypatch.setattr(Rules, 'apply', lambda self, *args, **kwargs: applied.append(kwargs.get('features')) or apply(self, *args, **kwargs))
+    results = Model().evaluate_batch(pipelines, sample_data)
+
+    # One preprocessing pass for the rules group
+    assert len(applied) == 1
+    assert set(applied[0]) == { 'open', 'close', 'sum_history' }
+    monkeypatch.setattr(Rules, 'apply', apply)
+    for result, (model, target_parameters, _) in zip(results, pipelines):
+        expected = Model().evaluate(model, sample_data, target_parameters, format='columns')
+        assert np.array_equal(result['prediction'], expected['prediction'])
+
+def test_evaluate_batch_classify_groups_by_target(sample_data, monkeypatch):
+    rules = { 'classify': { 'history': { 'method': 'linear_regression' } } }
+    close = { 'target_label': 'close', 'feature_labels': ['open'], 'rules': rules }
+    other = { **close, 'target_label': 'open', 'feature_labels': ['close'] }
+    df = Model()._data_features_target(sample_data, close)[0]
+    pipelines = [(LinearRegression().fit(df[['open']], df['close']), close, None), (LinearRegression().fit(df[['close']], df['open']), other, None)]
+
+    # Classify rules read the target, so each target is preprocessed on its own
+    targets = []
+    apply = Rules.apply
+    monkeypatch.setattr(Rules, 'apply', lambda self, df, target_label, **kwargs: targets.append(target_label) or apply(self, df, target_label, **kwargs))
+    Model().evaluate_batch(pipelines, sample_data)
+    assert sorted(targets) == ['close', 'open']
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
@@ -216,6 +216,40 @@ def test_linear_regression_classifier():
 #     assert np.all(result_data[f'{method}_feature2_max'] == [12, 22, 32])
 #     assert np.all(result_data[f'{method}_feature2_last_prediction'] == expected_feature2_mean)
 
+@pytest.mark.parametrize('params', [{}, {'fit_intercept': False}, {'positive': True}])
+def test_linear_regression_matches_per_row_fit(params):
+    rng = np.random.default_rng(7)
+    input = pd.DataFrame({
+        'feature1': [list(rng.normal(170, 2, size)) for size in [2, 5, 30, 12, 60]] + [[3.0, 3.0, 3.0]],
+        'feature3': [0.0] * 6,
+    })
+    config = { 'feature1': { 'method': 'linear_regression', 'params': params } }
+
+    batched = ClassifyRules(config=config)
+    per_row = ClassifyRules(config=config)
+    per_row.rules['feature1'] = per_row.get_function_v3(config['feature1'])
+
+    batched_data, batched_features = batched.apply(input, 'feature3')
+    per_row_data, per_row_features = per_row.apply(input, 'feature3')
+
+    assert batched_features == per_row_features
+    for feature in batched_features:
+        assert np.allclose(batched_data[feature], per_row_data[feature], rtol=1e-12)
+
+def test_classifier_process_pool_is_deterministic(random_forest_data):
+    method = 'random_forest'
+    definition = { 'method': method, 'params': {'n_estimators': 5}, 'seed': 3 }
+
+    sequential = ClassifyRules(config={ 'feature2': definition })
+    parallel = ClassifyRules(config={ 'feature2': { **definition, 'workers': 2, 'chunk_size': 1 } })
+
+    sequential_data, features = sequential.apply(random_forest_data, 'feature3')
+    parallel_data, parallel_features = parallel.apply(random_forest_data, 'feature3')
+
+    assert features == parallel_features
+    for feature in features:
+        assert np.array_equal(sequential_data[feature], parallel_data[feature])
+
 
 # Run the tests
 if __name__ == '__main__':
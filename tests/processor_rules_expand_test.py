@@ -42,6 +42,28 @@ def test_expand_rules(sample_data):
     assert np.all(result_data['feature2_1'] == [13, 14, 15])
     assert np.all(result_data['feature2_2'] == [16, 17, 18])
 
+def test_expand_rules_width():
+    data = pd.DataFrame({
+        'feature1': [[1, 2, 3], [4, 5], [6]],
+        'feature2': [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12]],
+    })
+    config = {
+        'feature1': 'columns',
+        'feature2': { 'type': 'columns', 'width': 2 },
+    }
+
+    expand_rules = ExpandRules(config=config)
+    result_data, new_features = expand_rules.apply(data)
+
+    assert new_features == ['feature1_0', 'feature1_1', 'feature1_2', 'feature2_0', 'feature2_1']
+
+    # shorter rows are padded with NaN, wider rows are truncated
+    assert np.allclose(result_data['feature1_1'], [2, 5, np.nan], equal_nan=True)
+    assert np.allclose(result_data['feature1_2'], [3, np.nan, np.nan], equal_nan=True)
+    assert np.all(result_data['feature2_0'] == [1, 5, 9])
+    assert np.all(result_data['feature2_1'] == [2, 6, 10])
+    assert 'feature2_2' not in result_data.columns
+
 
 # Run the tests
 if __name__ == '__main__':
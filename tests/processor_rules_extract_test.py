@@ -1,7 +1,7 @@
 import pandas as pd
 import numpy as np
 import pytest
-from lrnstak.processor_rules import Rules, ExtractRules
+from lrnstak.processor_rules import Rules, ExtractRules, DatetimeParseCache
 
 def create_sample_data():
     data = {
@@ -36,6 +36,98 @@ def test_extract_rules_datetime():
     assert 'last_timestamp_day_of_week' in results.columns
 
     # Add more assertions based on your expectations
+    assert np.all(results['last_timestamp_month'] == [11, 11, 11])
+    assert np.all(results['last_timestamp_year'] == [2023, 2023, 2023])
+    assert np.all(results['last_timestamp_day_of_week'] == [4, 5, 6])
+
+def test_extract_rules_datetime_format():
+    config = {
+        'last_timestamp': {
+            'type': 'datetime',
+            'format': '%Y-%m-%dT%H:%M:%SZ',
+            'elements': ['hour', 'day']
+        }
+    }
+    extract = ExtractRules(config)
+
+    results, features = extract.apply(create_sample_data())
+
+    assert features == ['last_timestamp_day', 'last_timestamp_hour']
+    assert np.all(results['last_timestamp_hour'] == [7, 8, 9])
+    assert np.all(results['last_timestamp_day'] == [24, 25, 26])
+
+def test_datetime_parse_cache():
+    cache = DatetimeParseCache(max_size=2)
+    timestamps = pd.Series(['2023-11-24T07:00:00Z', '2023-11-24T07:00:00Z', None, '2023-11-25T08:00:00Z'])
+
+    parsed = cache.parse(timestamps)
+
+    assert len(cache.entries) == 2
+    assert parsed[0] == pd.Timestamp('2023-11-24T07:00:00Z')
+    assert parsed[1] == parsed[0]
+    assert pd.isna(parsed[2])
+
+    # repeated values are served from the cache, the oldest entry is evicted past max_size
+    parsed = cache.parse(pd.Series(['2023-11-25T08:00:00Z', '2023-11-26T09:00:00Z']))
+    assert parsed[1] == pd.Timestamp('2023-11-26T09:00:00Z')
+    assert list(cache.entries) == [(None, '2023-11-25T08:00:00Z'), (None, '2023-11-26T09:00:00Z')]
+
+def test_extract_rules_mixed_time_zones():
+    config = {
+        'last_timestamp': { 'type': 'datetime', 'elements': ['hour', 'day'] },
+    }
+
+    # mixed offsets (e.g. across DST) and naive with Z values keep every element in its own zone
+    for timestamps in [['2023-11-24T07:00:00+02:00', '2023-11-25T08:00:00Z'], ['2023-11-24T07:00:00', '2023-11-25T08:00:00Z']]:
+        data = pd.DataFrame({'last_timestamp': timestamps + [None]})
+        results, features = ExtractRules(config).apply(data)
+        assert np.allclose(results['last_timestamp_hour'], [7, 8, np.nan], equal_nan=True)
+        assert np.allclose(results['last_timestamp_day'], [24, 25, np.nan], equal_nan=True)
+
+    data = pd.DataFrame({'last_timestamp': ['2023-11-24T07:00:00+02:00', '2023-11-25T08:00:00Z', '2023-11-26T09:00:00']})
+    results, features = ExtractRules({ 'last_timestamp': { 'type': 'epoch' } }).apply(data)
+    assert np.all(results['last_timestamp_epoch'] == [1700802000, 1700899200, 1700989200])
+
+    results, features = ExtractRules({ 'last_timestamp': { 'type': 'cyclical', 'elements': ['hour'] } }).apply(data)
+    assert np.allclose(results['last_timestamp_hour_sin'], np.sin(2 * np.pi * np.array([7, 8, 9]) / 24))
+
+def test_extract_rules_cyclical():
+    config = {
+        'last_timestamp': {
+            'type': 'cyclical',
+            'elements': ['hour', 'day_of_week']
+        }
+    }
+    extract = ExtractRules(config)
+
+    results, features = extract.apply(create_sample_data())
+
+    assert features == [
+        'last_timestamp_day_of_week_cos', 'last_timestamp_day_of_week_sin',
+        'last_timestamp_hour_cos', 'last_timestamp_hour_sin',
+    ]
+    assert np.allclose(results['last_timestamp_hour_sin'], np.sin(2 * np.pi * np.array([7, 8, 9]) / 24))
+    assert np.allclose(results['last_timestamp_hour_cos'], np.cos(2 * np.pi * np.array([7, 8, 9]) / 24))
+    assert np.allclose(results['last_timestamp_day_of_week_sin'], np.sin(2 * np.pi * np.array([4, 5, 6]) / 7))
+
+def test_extract_rules_epoch_and_numeric():
+    config = {
+        'last_timestamp': { 'type': 'epoch' },
+        'price': { 'type': 'numeric', 'strip': '$,' },
+    }
+    extract = ExtractRules(config)
+    data = create_sample_data()
+    data['price'] = ['$1,200.50', '17', 'n/a']
+
+    results, features = extract.apply(data)
+
+    assert features == ['last_timestamp_epoch', 'price_numeric']
+    assert np.all(results['last_timestamp_epoch'] == [1700809200, 1700899200, 1700989200])
+    assert np.allclose(results['price_numeric'], [1200.5, 17.0, np.nan], equal_nan=True)
+
+def test_extract_rules_unsupported_type():
+    with pytest.raises(Exception):
+        ExtractRules({'last_timestamp': { 'type': 'unknown' }})
 
 def test_rules_apply():
     instructions = {
@@ -58,6 +150,24 @@ def test_rules_apply():
     # Apply the rules
     result, features = rules.apply(data, None)
 
+    # the caller's frame is not modified
+    assert list(data.columns) == ['last_timestamp', 'history']
+    assert 'max_history' in result.columns
+    assert np.all(result['max_history'] == [3, 3, 3])
+
+def test_rules_apply_in_place():
+    instructions = {
+        'flatten': {
+            'history': ['max']
+        },
+    }
+    data = create_sample_data()
+
+    result, features = Rules(instructions).apply(data, None, copy=False)
+
+    assert result is data
+    assert 'max_history' in data.columns
+
 # Run the tests
 if __name__ == '__main__':
     pytest.main(['-v', __file__])
@@ -96,6 +96,91 @@ def test_flatten_rules_first_last(sample_data):
     assert np.all(result_data['last_feature1'] == [3, 4, 7])
     assert np.all(result_data['last_feature2'] == [12, 22, 32])
 
+def test_flatten_rules_ragged_rows():
+    data = pd.DataFrame({
+        'feature1': [[1, 2, 3, 4], [5], [6, 8]],
+    })
+    config = {
+        'feature1': ['sum', 'min', 'max', 'avg', 'norm', 'first', 'last'],
+    }
+
+    flatten_rules = FlattenRules(config=config)
+    result_data, new_features = flatten_rules.apply(data)
+
+    assert np.all(result_data['sum_feature1'] == [10, 5, 14])
+    assert np.all(result_data['min_feature1'] == [1, 5, 6])
+    assert np.all(result_data['max_feature1'] == [4, 5, 8])
+    assert np.allclose(result_data['avg_feature1'], [2.5, 5.0, 7.0])
+    assert np.allclose(result_data['norm_feature1'], [14 / 12, 0.0, 1.0])
+    assert np.all(result_data['first_feature1'] == [1, 5, 6])
+    assert np.all(result_data['last_feature1'] == [4, 5, 8])
+
+def test_flatten_rules_long_float_histories():
+    # realistic price histories, the sums may only differ from the builtin sum by rounding
+    rng = np.random.default_rng(0)
+    history = [list(100 + np.cumsum(rng.normal(size=length))) for length in [500, 500, 300, 499, 1]]
+    data = pd.DataFrame({'history_close': history})
+
+    result_data, new_features = FlattenRules(config={'history_close': ['sum', 'avg', 'norm', 'mean']}).apply(data)
+
+    def normalize(y):
+        y = np.asarray(y)
+        if np.min(y) == np.max(y): return 0.0
+        return sum((y - np.min(y))**2 / (np.max(y) - np.min(y))) / len(y)
+
+    assert np.allclose(result_data['sum_history_close'], [sum(y) for y in history], rtol=1e-12, atol=0)
+    assert np.allclose(result_data['avg_history_close'], [sum(y) / len(y) for y in history], rtol=1e-12, atol=0)
+    assert np.allclose(result_data['norm_history_close'], [normalize(y) for y in history], rtol=1e-12, atol=1e-12)
+    assert np.allclose(result_data['mean_history_close'], [np.mean(y) for y in history], rtol=1e-12, atol=0)
+
+def test_flatten_rules_rolling_windows():
+    history = [
+        [10.0, 11.0, 9.0, 12.0, 13.0, 8.0],
+        [1.0, 2.0, 3.0],
+        [5.0],
+    ]
+    data = pd.DataFrame({'history_close': history})
+    config = {
+        'history_close': ['rolling_mean_3', 'rolling_std_3', 'rolling_min_3', 'rolling_max_3', 'ewma_4'],
+    }
+
+    flatten_rules = FlattenRules(config=config)
+    result_data, new_features = flatten_rules.apply(data)
+
+    assert new_features == sorted(f'{type}_history_close' for type in config['history_close'])
+
+    for row, values in enumerate(history):
+        expected = pd.Series(values)
+        assert np.allclose(result_data['rolling_mean_3_history_close'][row], expected.rolling(3).mean().values[2:])
+        assert np.allclose(result_data['rolling_std_3_history_close'][row], expected.rolling(3).std().values[2:])
+        assert np.allclose(result_data['rolling_min_3_history_close'][row], expected.rolling(3).min().values[2:])
+        assert np.allclose(result_data['rolling_max_3_history_close'][row], expected.rolling(3).max().values[2:])
+        assert np.allclose(result_data['ewma_4_history_close'][row], expected.ewm(span=4, adjust=False).mean().values)
+
+def test_flatten_rules_rolling_windows_nan():
+    history = [
+        [10.0, np.nan, 9.0, 12.0, 13.0, 8.0, 7.0],
+        [np.nan, 2.0, 3.0, 4.0],
+        [1.0, 2.0, 3.0, np.nan],
+    ]
+    data = pd.DataFrame({'history_close': history})
+    config = {'history_close': ['rolling_mean_3', 'rolling_std_3', 'rolling_min_3', 'rolling_max_3', 'ewma_4']}
+
+    result_data, new_features = FlattenRules(config=config).apply(data)
+
+    # A NaN only affects the windows holding it, as with pandas rolling, ewma carries its average over it
+    for row, values in enumerate(history):
+        expected = pd.Series(values)
+        assert np.allclose(result_data['ewma_4_history_close'][row], expected.ewm(span=4, adjust=False).mean().values, equal_nan=True)
+        assert np.allclose(result_data['rolling_mean_3_history_close'][row], expected.rolling(3).mean().values[2:], equal_nan=True)
+        assert np.allclose(result_data['rolling_std_3_history_close'][row], expected.rolling(3).std().values[2:], equal_nan=True)
+        assert np.allclose(result_data['rolling_min_3_history_close'][row], expected.rolling(3).min().values[2:], equal_nan=True)
+        assert np.allclose(result_data['rolling_max_3_history_close'][row], expected.rolling(3).max().values[2:], equal_nan=True)
+
+def test_flatten_rules_unknown_window():
+    with pytest.raises(Exception):
+        FlattenRules(config={'history_close': ['rolling_median_3']})
+
 
 # Run the tests
 if __name__ == '__main__':
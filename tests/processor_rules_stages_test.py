@@ -0,0 +1,92 @@
+import pandas as pd
+import numpy as np
+import pytest
+from lrnstak.processor_rules import Rules
+
+
+@pytest.fixture
+def sample_data():
+    data = {
+        'last_timestamp': ['2023-11-24T07:00:00Z', '2023-11-25T08:00:00Z', '2023-11-26T09:00:00Z'],
+        'history_close': [[1.0, 2.0, 3.0, 4.0], [2.0, 4.0, 6.0, 8.0], [5.0, 4.0, 3.0, 2.0]],
+        'history_volume': [[10, 20, 30], [40, 50, 60], [70, 80, 90]],
+        'last_close': [4.0, 8.0, 2.0],
+    }
+    return pd.DataFrame(data)
+
+@pytest.fixture
+def instructions():
+    return {
+        'extract': {
+            'last_timestamp': { 'type': 'datetime', 'elements': ['hour'] },
+        },
+        'flatten': {
+            'history_close': ['rolling_mean_2', 'sum'],
+            'history_volume': ['max'],
+        },
+        'expand': {
+            'history_volume': 'columns',
+        },
+        'stages': [
+            {
+                'flatten': {
+                    'rolling_mean_2_history_close': ['last'],
+                },
+            },
+        ],
+    }
+
+def test_stages_keep_every_new_feature(sample_data, instructions):
+    result, features = Rules(instructions).apply(sample_data, 'last_close')
+
+    assert features == [
+        'last_timestamp_hour',
+        'rolling_mean_2_history_close', 'sum_history_close',
+        'max_history_volume',
+        'history_volume_0', 'history_volume_1', 'history_volume_2',
+        'last_rolling_mean_2_history_close',
+    ]
+    assert np.all(result['last_rolling_mean_2_history_close'] == [3.5, 7.0, 2.5])
+    assert np.all(result['sum_history_close'] == [10, 20, 14])
+
+def test_schedule_runs_independent_rules_together(instructions):
+    waves = Rules(instructions).schedule('last_close')
+
+    assert [[(type(operation.processor).__name__, operation.feature) for operation in wave] for wave in waves] == [
+        [
+            ('ExtractRules', 'last_timestamp'),
+            ('FlattenRules', 'history_close'),
+            ('FlattenRules', 'history_volume'),
+            ('ExpandRules', 'history_volume'),
+        ],
+        [
+            ('FlattenRules', 'rolling_mean_2_history_close'),
+        ],
+    ]
+
+def test_requested_features_skip_unused_rules(sample_data, instructions):
+    rules = Rules(instructions)
+
+    result, features = rules.apply(sample_data, 'last_close', features=['last_rolling_mean_2_history_close'])
+
+    assert features == ['rolling_mean_2_history_close', 'sum_history_close', 'last_rolling_mean_2_history_close']
+    assert 'last_timestamp_hour' not in result.columns
+    assert 'history_volume_0' not in result.columns
+    assert np.all(result['last_rolling_mean_2_history_close'] == [3.5, 7.0, 2.5])
+
+    # the compiled schedule is reused for the same request
+    assert rules.schedule('last_close', ['last_rolling_mean_2_history_close']) is \
+        rules.schedule('last_close', ['last_rolling_mean_2_history_close'])
+
+def test_thread_pool_matches_sequential(sample_data, instructions):
+    sequential, sequential_features = Rules(instructions, max_workers=1).apply(sample_data, 'last_close')
+    threaded, threaded_features = Rules(instructions, max_workers=4).apply(sample_data, 'last_close')
+
+    assert sequential_features == threaded_features
+    for feature in sequential_features:
+        assert sequential[feature].equals(threaded[feature])
+
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
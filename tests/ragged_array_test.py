@@ -0,0 +1,58 @@
+import pandas as pd
+import numpy as np
+import pytest
+from lrnstak.ragged_array import RaggedArray
+
+
+@pytest.fixture
+def ragged_series():
+    return pd.Series([[1, 2, 3], [4], [], [5, 6]], index=[10, 11, 12, 13])
+
+def test_from_series_offsets(ragged_series):
+    ragged = RaggedArray.from_series(ragged_series)
+
+    assert ragged.width is None
+    assert ragged.matrix is None
+    assert np.all(ragged.offsets == [0, 3, 4, 4, 6])
+    assert np.all(ragged.values == [1, 2, 3, 4, 5, 6])
+    assert np.all(ragged.series(ragged.lengths).index == [10, 11, 12, 13])
+
+def test_segment_reductions(ragged_series):
+    ragged = RaggedArray.from_series(ragged_series)
+
+    assert np.all(ragged.sum() == [6, 4, 0, 11])
+    assert np.allclose(ragged.min(), [1, 4, np.nan, 5], equal_nan=True)
+    assert np.allclose(ragged.max(), [3, 4, np.nan, 6], equal_nan=True)
+    assert np.allclose(ragged.mean(), [2, 4, np.nan, 5.5], equal_nan=True)
+    assert np.allclose(ragged.first(), [1, 4, np.nan, 5], equal_nan=True)
+    assert np.allclose(ragged.last(), [3, 4, np.nan, 6], equal_nan=True)
+
+def test_equal_length_rows_use_matrix():
+    ragged = RaggedArray.from_series(pd.Series([[1, 2], [3, 4], [5, 6]]))
+
+    assert ragged.width == 2
+    assert ragged.matrix.shape == (3, 2)
+    assert np.all(ragged.sum() == [3, 7, 11])
+    assert np.all(ragged.min() == [1, 3, 5])
+    assert [list(row) for row in ragged.split()] == [[1, 2], [3, 4], [5, 6]]
+
+def test_statistics_are_shared(ragged_series):
+    ragged = RaggedArray.from_series(ragged_series)
+
+    # avg/mean and norm reuse the same per-row intermediates
+    assert ragged.sum() is ragged.sum()
+    assert ragged.min() is ragged.min()
+    assert ragged.mean() is ragged.mean()
+
+    first = ragged.series(ragged.sum())
+    first.iloc[0] = -1
+    assert ragged.sum()[0] == 6
+
+def test_scalar_rows_are_rejected():
+    with pytest.raises(ValueError):
+        RaggedArray.from_series(pd.Series([[1, 2], 3]))
+
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
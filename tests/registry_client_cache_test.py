@@ -0,0 +1,44 @@
+import pytest
+from lrnstak.processor_rules import Rules
+from lrnstak.registry_client import CachingRegistry, Registry
+
+@pytest.fixture
+def registry(monkeypatch):
+    calls = []
+    parameters = { 'target_label': 'close', 'feature_labels': ['sum_history'], 'rules': { 'flatten': { 'history': ['sum'] } } }
+
+    def get(self, model_name, version):
+        calls.append((model_name, version))
+        return object(), parameters, 200
+
+    # the registry service is replaced by a loader that counts its calls
+    monkeypatch.setattr(Registry, 'get', get)
+    registry = CachingRegistry('http://registry')
+    registry.calls = calls
+    return registry
+
+def test_pipeline_cached_with_model(registry):
+    model, parameters, rules, status = registry.get_pipeline('m', 'v1')
+
+    # The rules are compiled once at load time, with the schedule of the model's features
+    assert isinstance(rules, Rules)
+    assert ('close', ('sum_history',)) in rules.schedules
+
+    # Later requests get the same model and compiled rules without reloading
+    assert registry.get_pipeline('m', 'v1')[2] is rules
+    assert registry.get_and_cache('m', 'v1') == (model, parameters, 200)
+    assert len(registry.calls) == 1
+
+def test_pipeline_evicted_with_model(registry):
+    model, _, rules, _ = registry.get_pipeline('m', 'v1')
+    registry.cache['m_v1']['expires'] = 1
+
+    # An expired model is reloaded together with freshly compiled rules
+    reloaded, _, recompiled, _ = registry.get_pipeline('m', 'v1')
+    assert reloaded is not model
+    assert recompiled is not rules
+    assert len(registry.calls) == 2
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
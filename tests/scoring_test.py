@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score, mean_absolute_percentage_error
+from lrnstak.scoring import Scorer
+
+@pytest.fixture
+def sample_data():
+    rng = np.random.default_rng(0)
+    y = pd.Series(100 + np.cumsum(rng.normal(size=50)))
+    y_pred = y.to_numpy() + rng.normal(size=50)
+    return y, y_pred
+
+def test_score_matches_sklearn(sample_data):
+    y, y_pred = sample_data
+    score = Scorer(['mape']).score(y, y_pred)
+
+    # The prediction of each row is scored against the next target, same as before
+    assert score['mse'] == pytest.approx(mean_squared_error(y[1:], y_pred[:-1]))
+    assert score['mae'] == pytest.approx(mean_absolute_error(y[1:], y_pred[:-1]))
+    assert score['r2'] == pytest.approx(r2_score(y[1:], y_pred[:-1]))
+    assert score['mape'] == pytest.approx(mean_absolute_percentage_error(y[1:], y_pred[:-1]))
+
+def test_score_without_lag(sample_data):
+    y, y_pred = sample_data
+    score = Scorer().score(y, y_pred, lag=0)
+
+    # Rows that are not consecutive are scored against their own target
+    assert score['mse'] == pytest.approx(mean_squared_error(y, y_pred))
+    assert score['r2'] == pytest.approx(r2_score(y, y_pred))
+
+def test_score_constant_target():
+    y = np.full(5, 3.0)
+
+    # A constant target scores r2 1 for a perfect prediction and 0 otherwise, like sklearn
+    assert Scorer().score(y, y)['r2'] == 1.0
+    assert Scorer().score(y, y + 1)['r2'] == 0.0
+    assert Scorer().score(y, y + 1)['r2'] == r2_score(y[1:], (y + 1)[:-1])
+
+def test_directional_accuracy():
+    y = np.array([1.0, 2.0, 3.0, 2.0, 1.0])
+    # aligned with the next target the actual moves are up, down, down and the predicted ones down, down, down
+    y_pred = np.array([2.5, 1.5, 2.5, 0.5, 0.0])
+    assert Scorer(['directional_accuracy']).score(y, y_pred)['directional_accuracy'] == pytest.approx(2 / 3)
+
+def test_unsupported_metric():
+    with pytest.raises(ValueError):
+        Scorer(['unknown'])
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from lrnstak.training_module import ModelTrainer
+
+@pytest.fixture
+def training_data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(80, 3)), columns=['a', 'b', 'c'])
+    y = X['a'] * 2 + X['b'] + rng.normal(scale=0.1, size=80)
+    return X, y
+
+@pytest.fixture
+def parameters():
+    return {
+        'hyper': { 'linear_regression': { }, 'random_forest': { 'random_state': 1, 'n_estimators': 20 }, 'decision_tree': { 'random_state': 1 } },
+    }
+
+def candidates(parameters, **settings):
+    trainer = ModelTrainer({ **parameters, **settings })
+    models = {name: trainer._create(name, name, parameters['hyper'][name]) for name in parameters['hyper']}
+    return trainer, models
+
+def test_cpu_budget_sets_n_jobs(training_data, parameters):
+    trainer, models = candidates(parameters, cpu_budget=6)
+    trainer._fit_candidates(models, *training_data)
+
+    # 3 candidates train at once, the estimators taking n_jobs share the other cores
+    assert models['random_forest'].get_params()['n_jobs'] == 2
+    assert models['linear_regression'].get_params()['n_jobs'] == 2
+
+def test_hyper_n_jobs_is_kept(training_data, parameters):
+    parameters['hyper']['random_forest']['n_jobs'] = 1
+    trainer, models = candidates(parameters, cpu_budget=6)
+    trainer._fit_candidates(models, *training_data)
+
+    assert models['random_forest'].get_params()['n_jobs'] == 1
+
+def test_grid_candidates_keep_n_jobs(training_data, parameters):
+    parameters['hyper']['random_forest'] = { 'random_state': 1, 'n_estimators': [5, 10], 'n_jobs': 1 }
+    trainer = ModelTrainer({ **parameters, 'cpu_budget': 6, 'selection': { 'strategy': 'successive_halving' }, 'feature_labels': ['a', 'b', 'c'] })
+    fitted = []
+    fit = trainer._fit_candidates
+    def _fit_candidates(models, X, y):
+        fit(models, X, y)
+        fitted.extend(model.get_params()['n_jobs'] for name, model in models.items() if name.startswith('random_forest'))
+    trainer._fit_candidates = _fit_candidates
+    trainer.train_sk([{ 'last_close': float(y), **row } for row, y in zip(training_data[0].to_dict(orient='records'), training_data[1])])
+
+    # random_forest_0 and random_forest_1 run with the n_jobs of their hyper parameters in every round
+    assert len(fitted) > 0 and set(fitted) == { 1 }
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_concurrent_fit_matches_sequential(training_data, parameters, executor):
+    X, y = training_data
+    trainer, sequential = candidates(parameters, cpu_budget=1)
+    trainer._fit_candidates(sequential, X, y)
+    trainer, concurrent = candidates(parameters, cpu_budget=3, executor=executor)
+    trainer._fit_candidates(concurrent, X, y)
+
+    for name, model in sequential.items():
+        assert np.allclose(model.predict(X), concurrent[name].predict(X))
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_failed_candidate_raises(training_data, parameters, executor):
+    parameters['hyper']['decision_tree']['max_depth'] = -1
+    trainer, models = candidates(parameters, cpu_budget=3, executor=executor)
+
+    # The worker's error comes back naming the candidate
+    with pytest.raises(ValueError, match='decision_tree'):
+        trainer._fit_candidates(models, *training_data)
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
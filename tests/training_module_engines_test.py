@@ -0,0 +1,58 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from lrnstak.training_module import ModelTrainer, ModelSearch
+
+@pytest.fixture
+def sample_data():
+    # Create a small random walk of quotes for testing
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(size=80))
+    return [{ 'open': c + rng.normal(), 'high': c + 1, 'low': c - 1, 'close': c } for c in close]
+
+@pytest.fixture
+def parameters():
+    return {
+        'target_label': 'close',
+        'feature_labels': ['open', 'high', 'low'],
+        'hyper': { 'hist_gbm': { 'max_iter': 20 }, 'random_forest': { 'n_estimators': 10 } },
+        'cpu_budget': 2,
+    }
+
+def test_hist_gbm_engine(sample_data, parameters, tmp_path):
+    trainer = ModelTrainer({ **parameters, 'engine': 'hist_gbm' })
+    model, results = trainer.train(sample_data)
+
+    # The engine only trains its own algorithm
+    assert list(results['results']) == ['hist_gbm']
+    assert type(model).__name__ == 'HistGradientBoostingRegressor'
+    assert model.get_params()['max_iter'] == 20
+
+    # The serialized model predicts the same as the trained one
+    trainer.serialize(model, tmp_path / 'model.joblib')
+    loaded = joblib.load(tmp_path / 'model.joblib')
+    X = pd.DataFrame(sample_data)[['open', 'high', 'low']]
+    assert np.array_equal(loaded.predict(X), model.predict(X))
+
+def test_candidates(sample_data, parameters):
+    model, results = ModelTrainer({ **parameters, 'candidates': ['hist_gbm'] }).train(sample_data)
+
+    # The default candidates are trained alongside hist_gbm
+    assert sorted(results['results']) == ['decision_tree', 'gradient_boosting', 'hist_gbm', 'linear_regression', 'random_forest']
+
+def test_unsupported_candidate(parameters):
+    with pytest.raises(ValueError):
+        ModelTrainer({ **parameters, 'candidates': ['unknown'] })
+
+def test_tensorflow_candidate_is_rejected(parameters):
+    # keras models train through train_tf, they can not join the sklearn candidates
+    with pytest.raises(ValueError, match='tensorflow'):
+        ModelTrainer({ **parameters, 'candidates': ['tensorflow'] })
+
+    with pytest.raises(ValueError, match='tensorflow'):
+        ModelSearch({ **parameters, 'candidates': ['tensorflow'] }, { 'space': { 'split.test_size': [0.2] } })
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
@@ -0,0 +1,42 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from lrnstak import engines
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _import_in_subprocess(modules):
+    # a fresh interpreter, so nothing imported by other tests is counted
+    code = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {modules}\n"
+        "elapsed = time.perf_counter() - started\n"
+        "print(json.dumps({ 'seconds': elapsed, 'modules': sorted(m for m in sys.modules if m.split('.')[0] in ('tensorflow', 'sklearn')) }))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_import_time_budget():
+    budget = float(os.environ.get('LRNSTAK_IMPORT_BUDGET', '3.0'))
+    result = _import_in_subprocess('lrnstak.training_module, lrnstak.predictions_module')
+
+    # No training backend is imported until an engine is used
+    assert result['modules'] == []
+    assert result['seconds'] < budget
+
+def test_estimator_registry():
+    # Estimators are resolved from their import path on first use
+    regressor = engines.estimator('decision_tree')
+    assert regressor.__name__ == 'DecisionTreeRegressor'
+    assert engines.estimator('decision_tree') is regressor
+    assert engines.estimator('decision_tree', engines.CLASSIFIERS).__name__ == 'DecisionTreeClassifier'
+
+    with pytest.raises(ValueError):
+        engines.estimator('unknown')
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
@@ -0,0 +1,70 @@
+import copy
+import numpy as np
+import pandas as pd
+import pytest
+from lrnstak.engines import SklearnEngine
+from lrnstak.training_module import ModelTrainer
+
+@pytest.fixture
+def sample_data():
+    # Create a small random walk of quotes, the second window overlaps the first
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(size=100))
+    rows = [{ 'day': i, 'open': c + rng.normal(), 'high': c + 1, 'low': c - 1, 'close': c, 'history': list(rng.normal(c, 1, 5)) } for i, c in enumerate(close)]
+    return rows[:90], rows[10:]
+
+@pytest.fixture
+def parameters():
+    return {
+        'engine': 'hist_gbm',
+        'target_label': 'close',
+        'feature_labels': ['open', 'high', 'low'],
+        'rules': { 'flatten': { 'history': ['sum', 'max'] } },
+        'hyper': { 'hist_gbm': { 'max_iter': 20 } },
+    }
+
+def _previous(parameters, training_data):
+    # what the registry holds for the previous version after a full training
+    registered = copy.deepcopy(parameters)
+    model, _ = ModelTrainer(registered).train(training_data)
+    return { 'model': model, 'parameters': registered, 'training_data': training_data }
+
+def test_train_incremental(sample_data, parameters):
+    old, new = sample_data
+    previous = _previous(parameters, old)
+
+    trainer = ModelTrainer({ **copy.deepcopy(parameters), 'incremental': { 'from_version': 'v1', 'key': 'day' } })
+    model, results = trainer.train_incremental(previous, new)
+
+    # Only the new rows are preprocessed and trained on, the model grows by their share of iterations
+    assert results['incremental'] == { 'from_version': 'v1', 'rows': 90, 'new_rows': 10, 'mode': 'warm_start' }
+    assert results['preprocessing']['misses'] == 1
+    assert model.get_params()['max_iter'] == 23
+    assert trainer.feature_cols == previous['parameters']['feature_labels']
+    assert list(results['results']) == ['hist_gbm']
+
+def test_train_incremental_changed_rules(sample_data, parameters):
+    old, new = sample_data
+    previous = _previous(parameters, old)
+
+    # Different rules produce different features, so the model is trained from scratch
+    changed = { **copy.deepcopy(parameters), 'rules': { 'flatten': { 'history': ['min'] } }, 'incremental': { 'from_version': 'v1' } }
+    model, results = ModelTrainer(changed).train_incremental(previous, new)
+    assert results['incremental']['mode'] == 'full'
+    assert model is not previous['model']
+
+def test_resume_ensembles():
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(40, 3)))
+    y = X.sum(axis=1)
+    engine = SklearnEngine()
+
+    # Ensembles add estimators trained on the new rows, plain models can only be refit
+    forest = engine.fit(engine.create('random_forest', { 'n_estimators': 10 }), X, y)
+    assert engine.resume(forest, X[:10], y[:10], 0.25) == 'warm_start'
+    assert len(forest.estimators_) == 13
+    assert engine.resume(engine.fit(engine.create('linear_regression', {}), X, y), X, y, 0.25) is None
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
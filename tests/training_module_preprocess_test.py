@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from lrnstak.training_module import ModelTrainer
+
+@pytest.fixture
+def sample_data():
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(size=50))
+    return [{ 'open': c + rng.normal(), 'close': c, 'history': list(rng.normal(c, 1, 4)) } for c in close]
+
+@pytest.fixture
+def parameters():
+    return {
+        'target_label': 'close',
+        'feature_labels': ['open'],
+        'rules': { 'flatten': { 'history': ['sum', 'max'] } },
+        'cpu_budget': 1,
+    }
+
+def counted(trainer):
+    calls = []
+    apply = trainer.rules.apply
+    def _apply(df, *args, **kwargs):
+        calls.append(len(df))
+        return apply(df, *args, **kwargs)
+    trainer.rules.apply = _apply
+    return calls
+
+def test_one_apply_per_dataset(sample_data, parameters):
+    trainer = ModelTrainer(parameters)
+    calls = counted(trainer)
+
+    model, results = trainer.train(sample_data[:40], sample_data[40:])
+
+    # Every candidate is scored on the testing data, which is still preprocessed once
+    assert calls == [40, 10]
+    assert results['preprocessing']['misses'] == 2
+
+def test_new_dataset_is_not_served_stale(sample_data, parameters):
+    trainer = ModelTrainer(parameters)
+    calls = counted(trainer)
+
+    first, _ = trainer.preprocess(sample_data[:10])
+    assert trainer.preprocess(sample_data)[0] is not first
+    # another list is another dataset, whatever id() it gets
+    second, _ = trainer.preprocess([dict(row, close=0.0) for row in sample_data[:10]])
+
+    assert calls == [10, 50, 10]
+    assert np.all(second['close'] == 0.0)
+    assert not np.all(first['close'] == 0.0)
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from lrnstak.training_module import ModelSearch
+
+@pytest.fixture
+def sample_data():
+    # Create a small random walk of quotes for testing
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(size=60))
+    return [{ 'open': c + rng.normal(), 'high': c + 1, 'low': c - 1, 'close': c, 'history': list(rng.normal(c, 1, 5)) } for c in close]
+
+@pytest.fixture
+def parameters():
+    return {
+        'target_label': 'close',
+        'feature_labels': ['open', 'high', 'low'],
+        'rules': { 'flatten': { 'history': ['sum', 'max'] } },
+        'hyper': { 'linear_regression': { }, 'decision_tree': { 'random_state': 1 } },
+        'cpu_budget': 2,
+    }
+
+def test_grid_search(sample_data, parameters):
+    search = ModelSearch(parameters, { 'space': { 'hyper.decision_tree.max_depth': [2, 4], 'split.test_size': [0.2, 0.3] } })
+    model, best_parameters, results = search.run(sample_data)
+
+    # Every grid point is a trial, the best one is returned with its parameters
+    trials = results['search']['trials']
+    assert len(trials) == 4
+    best = trials[results['search']['best_trial']]
+    assert best_parameters['hyper']['decision_tree']['max_depth'] == best['parameters']['hyper.decision_tree.max_depth']
+    assert best_parameters['split']['test_size'] == best['parameters']['split.test_size']
+    assert model is not None
+
+    # The training data is preprocessed once for all trials
+    assert results['preprocessing']['misses'] == 1
+    assert results['preprocessing']['hits'] == 4
+
+    # The caller's parameters are left untouched
+    assert 'max_depth' not in parameters['hyper']['decision_tree']
+
+def test_random_search(sample_data, parameters):
+    space = { 'hyper.decision_tree.max_depth': [2, 4, 8], 'split.test_size': [0.2, 0.3] }
+    first = ModelSearch(parameters, { 'type': 'random', 'n_iter': 3, 'random_state': 7, 'space': space }).trials()
+    second = ModelSearch(parameters, { 'type': 'random', 'n_iter': 3, 'random_state': 7, 'space': space }).trials()
+
+    # Random trials are reproducible with a random_state
+    assert len(first) == 3
+    assert [point for point, _ in first] == [point for point, _ in second]
+
+def test_search_rejects_preprocessing_parameters(parameters):
+    with pytest.raises(ValueError):
+        ModelSearch(parameters, { 'space': { 'rules.flatten.history': [['sum'], ['max']] } })
+
+    with pytest.raises(ValueError):
+        ModelSearch(parameters, { 'type': 'bayes', 'space': { } })
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
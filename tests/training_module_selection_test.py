@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from lrnstak.training_module import ModelTrainer, ModelSearch
+
+@pytest.fixture
+def sample_data():
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(size=90))
+    return [{ 'open': c + rng.normal(), 'high': c + 1, 'close': c } for c in close]
+
+@pytest.fixture
+def parameters():
+    return {
+        'target_label': 'close',
+        'feature_labels': ['open', 'high'],
+        'selection': { 'strategy': 'successive_halving', 'eta': 3 },
+        # 6 decision trees and the 3 other default candidates
+        'hyper': {
+            'decision_tree': { 'random_state': 1, 'max_depth': [1, 2, 3, 4, 5, 6] },
+            'random_forest': { 'random_state': 1, 'n_estimators': 10 },
+            'gradient_boosting': { 'random_state': 1, 'n_estimators': 10 },
+        },
+        'cpu_budget': 1,
+    }
+
+def test_successive_halving_rounds(sample_data, parameters):
+    model, results = ModelTrainer(parameters).train(sample_data)
+    rounds = [[score for score in results['scores'] if score.get('round') == round] for round in range(3)]
+
+    # 9 candidates, 3 rounds keeping the best third, on 1/9, 1/3 and all of the training rows
+    assert [len(scores) for scores in rounds] == [9, 3, 1]
+    assert [{score['resource'] for score in scores} for scores in rounds] == [{ 1 / 9 }, { 1 / 3 }, { 1.0 }]
+    for previous, scores in zip(rounds, rounds[1:]):
+        ranked = sorted(previous, key=lambda score: (score['mse'], score['mae']))
+        assert {score['algorithm'] for score in scores} == {score['algorithm'] for score in ranked[:len(scores)]}
+
+    # Every candidate is reported, eliminated ones with the score of the round they were dropped in
+    winner = rounds[2][0]['algorithm']
+    assert len(results['results']) == 9
+    assert 'round' not in results['results'][winner]
+    for scores, survivors in [(rounds[0], rounds[1]), (rounds[1], rounds[2])]:
+        kept = {score['algorithm'] for score in survivors}
+        for score in scores:
+            if score['algorithm'] not in kept:
+                assert results['results'][score['algorithm']] is score
+    assert model is not None
+
+def test_default_selection_reports_every_engine(sample_data, parameters):
+    del parameters['selection']
+    parameters['hyper']['decision_tree']['max_depth'] = 3
+    model, results = ModelTrainer(parameters).train(sample_data)
+
+    assert set(results['results']) == { 'linear_regression', 'random_forest', 'decision_tree', 'gradient_boosting' }
+
+def test_exact_fit_wins(sample_data, parameters):
+    # close == high - 1, linear_regression fits it exactly on the shuffled test split
+    del parameters['selection']
+    parameters['hyper']['decision_tree']['max_depth'] = 3
+    trainer = ModelTrainer(parameters)
+    model, results = trainer.train(sample_data)
+
+    assert trainer.best_model_name == 'linear_regression'
+    assert results['results']['linear_regression']['mse'] < 1e-12
+    assert min(score['mse'] for name, score in results['results'].items() if name != 'linear_regression') > 1e-3
+
+def test_exact_fit_wins_successive_halving(sample_data, parameters):
+    trainer = ModelTrainer(parameters)
+    model, results = trainer.train(sample_data)
+
+    assert trainer.best_model_name == 'linear_regression'
+    assert [score['algorithm'] for score in results['scores'] if score.get('round') == 2] == ['linear_regression']
+
+def test_exact_fit_wins_search(sample_data, parameters):
+    del parameters['selection']
+    search = ModelSearch(parameters, { 'space': { 'hyper.decision_tree.max_depth': [2, 4] } })
+    model, best_parameters, results = search.run(sample_data)
+
+    for trial in results['search']['trials']:
+        assert min(trial['results'], key=lambda name: trial['results'][name]['mse']) == 'linear_regression'
+    assert search.best_trainer.best_model_name == 'linear_regression'
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
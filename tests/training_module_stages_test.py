@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from lrnstak.training_module import ModelTrainer
+
+@pytest.fixture
+def sample_data():
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(size=40))
+    return [{ 'open': c + rng.normal(), 'close': c, 'history_close': list(rng.normal(c, 1, 6)) } for c in close]
+
+def test_train_staged_rolling_rules(sample_data):
+    parameters = {
+        'target_label': 'close',
+        'feature_labels': ['open'],
+        'rules': {
+            'flatten': { 'history_close': ['rolling_mean_3'] },
+            'stages': [{ 'flatten': { 'rolling_mean_3_history_close': ['last'] } }],
+        },
+        'hyper': { 'linear_regression': { }, 'decision_tree': { 'random_state': 1 } },
+        'cpu_budget': 1,
+    }
+    trainer = ModelTrainer(parameters)
+    model, results = trainer.train(sample_data)
+
+    # The array valued rolling window only feeds the next stage, its last value is a feature
+    assert trainer.feature_cols == ['open', 'last_rolling_mean_3_history_close']
+    assert set(results['results']) == { 'linear_regression', 'random_forest', 'decision_tree', 'gradient_boosting' }
+    assert model is not None
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.model_selection import train_test_split
+from lrnstak.training_module import ModelTrainer
+
+@pytest.fixture
+def sample_data():
+    # Create a small random walk of quotes for testing
+    rng = np.random.default_rng(0)
+    close = 10 + np.cumsum(rng.normal(size=80)) / 10
+    return [{ 'open': c + rng.normal() / 10, 'high': c + 0.1, 'low': c - 0.1, 'close': c } for c in close]
+
+@pytest.fixture
+def parameters():
+    return {
+        'engine': 'tensorflow',
+        'target_label': 'close',
+        'feature_labels': ['open', 'high', 'low'],
+        'tensorflow': { 'batch_size': 16, 'epochs': 3, 'patience': 1 },
+    }
+
+def test_train_tf(sample_data, parameters):
+    trainer = ModelTrainer(parameters)
+    model, results = trainer.train(sample_data)
+
+    # Every variant is scored once, the best one is returned
+    assert sorted(results['results']) == ['tf_relu', 'tf_sigmoid', 'tf_tanh']
+    assert model is not None
+
+    # tf_mse is the mean squared error on the test split, same as keras' evaluate
+    df = pd.DataFrame(sample_data)
+    _, X_test, _, y_test = train_test_split(df[['open', 'high', 'low']], df['close'], test_size=0.2, random_state=142)
+    expected = model.evaluate(X_test.to_numpy(np.float32), y_test.to_numpy(np.float32), verbose=0)
+    assert results['results'][trainer.best_model_name]['tf_mse'] == pytest.approx(expected, rel=1e-4)
+
+def test_train_tf_validation_is_held_out(sample_data, parameters):
+    trainer = ModelTrainer(parameters)
+    fits = []
+    fit = trainer.backend.fit
+    def _fit(model, X, y, validation=None):
+        fits.append((X, validation[0]))
+        return fit(model, X, y, validation=validation)
+    trainer.backend.fit = _fit
+    trainer.train(sample_data)
+
+    # Early stopping watches a share of the training split, never the test split it is scored on
+    df = pd.DataFrame(sample_data)
+    _, X_test = train_test_split(df[['open', 'high', 'low']].to_numpy(np.float32), test_size=0.2, random_state=142)
+    test_rows = {tuple(row) for row in X_test}
+    for X, X_validation in fits:
+        assert len(X_validation) == 13 and len(X) == 51
+        assert not test_rows & {tuple(row) for row in X_validation}
+        assert not {tuple(row) for row in X} & {tuple(row) for row in X_validation}
+
+def test_train_tf_multi_head(sample_data, parameters):
+    parameters['tensorflow']['multi_head'] = True
+    trainer = ModelTrainer(parameters)
+    model, results = trainer.train(sample_data)
+
+    # The heads are scored like separate models
+    assert sorted(results['results']) == ['tf_relu', 'tf_sigmoid', 'tf_tanh']
+
+    # The chosen head is exported as a standalone model with a single output
+    X = pd.DataFrame(sample_data)[['open', 'high', 'low']].to_numpy(np.float32)
+    assert len(model.outputs) == 1
+    assert model.predict(X, verbose=0).shape == (len(X), 1)
+
+def test_export_head(parameters):
+    from lrnstak.engines import TensorflowEngine
+
+    engine = TensorflowEngine(parameters)
+    heads = engine.create_heads(3)
+    X = np.random.default_rng(1).normal(size=(20, 3)).astype(np.float32)
+
+    # Every exported head predicts exactly what it predicted inside the multi-head model
+    predictions = engine.predict_heads(heads, X)
+    for name in engine.algorithms:
+        assert np.allclose(engine.predict(engine.export_head(heads, name), X), predictions[name])
+
+# Run the tests
+if __name__ == '__main__':
+    pytest.main(['-v', __file__])